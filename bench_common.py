@@ -0,0 +1,6 @@
+"""Helpers shared by the benchmark scripts."""
+
+def percentile(values, pct):
+    """The value below which pct percent of the values fall (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * pct // 100)]
@@ -0,0 +1,166 @@
+"""Compares NetworkManager queries over D-Bus with the nmcli/iwlist subprocesses they replace.
+
+Runs the same operations the kiosk, the portal and the Pico provisioning script perform, once
+through network_manager.NetworkManagerClient (uncached and with the shared client's cache) and
+once through the commands they used to fork, and reports latency and processes forked per call.
+
+Without --fake it talks to the real NetworkManager and runs the real commands, so it needs a
+Pi with python3-dbus. With --fake the client uses fake_network_manager.FakeSystemBus and the
+commands are small shell scripts on PATH; real nmcli also has to connect to the bus on every
+run, so the subprocess numbers are then a lower bound.
+
+Usage:
+    python3 bench_network_manager.py --fake --iterations 200
+    python3 bench_network_manager.py --activate Hotspot --json   # on the Pi; switches networks
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from bench_common import percentile
+from network_manager import CACHE_TTL, NetworkManagerClient, shared_client
+from fake_network_manager import FakeNetworkManager, FakeSystemBus
+
+OPERATIONS = ("credentials", "device_ip", "scan")
+
+FAKE_SUDO = """#!/bin/sh
+exec "$@"
+"""
+
+FAKE_NMCLI = """#!/bin/sh
+case "$*" in
+    *"NAME,TYPE"*) echo "Home:802-11-wireless"; echo "lo:loopback" ;;
+    *"wireless-security.psk"*) echo "home-password" ;;
+    *"wireless.ssid"*) echo "HomeNet" ;;
+    *"IP4.ADDRESS"*) echo "192.168.1.50/24" ;;
+    *"connection up"*) echo "Connection successfully activated" ;;
+esac
+"""
+
+FAKE_IWLIST = """#!/bin/sh
+echo "wlan0     Scan completed :"
+i=1
+while [ $i -le {networks} ]; do
+    printf '          Cell %02d - Address: AA:BB:CC:DD:EE:%02X\\n' $i $i
+    echo "                    Channel:$((i % 11 + 1))"
+    echo "                    Quality=40/70  Signal level=-$((30 + i)) dBm"
+    echo "                    Encryption key:on"
+    echo "                    ESSID:\\"Network $i\\""
+    i=$((i + 1))
+done
+"""
+
+def forks():
+    """Processes created on this machine since boot."""
+    with open("/proc/stat") as f:
+        for line in f:
+            if line.startswith("processes "):
+                return int(line.split()[1])
+    return 0
+
+def run(command):
+    return subprocess.run(command, capture_output=True, text=True, check=True).stdout
+
+def subprocess_credentials():
+    """The nmcli calls get_wifi_credentials() makes in connect_to_pico.py."""
+    connections = run(["nmcli", "-t", "-f", "NAME,TYPE", "connection", "show", "--active"])
+    name = next(line.split(":")[0] for line in connections.splitlines() if line.endswith(":802-11-wireless"))
+    password = run(["nmcli", "-s", "-g", "802-11-wireless-security.psk", "connection", "show", name]).strip()
+    ssid = run(["nmcli", "-g", "802-11-wireless.ssid", "connection", "show", name]).strip()
+    return ssid, password
+
+def subprocess_operations(args):
+    return {
+        "credentials": subprocess_credentials,
+        "device_ip": lambda: run(["nmcli", "-g", "IP4.ADDRESS", "device", "show", args.device]).split("/")[0],
+        "scan": lambda: run(["sudo", "iwlist", args.device, "scan"]),
+        "activate": lambda: run(["sudo", "nmcli", "connection", "up", args.activate]),
+    }
+
+def dbus_operations(client, args):
+    return {
+        "credentials": client.wifi_credentials,
+        "device_ip": lambda: client.device_ip(args.device),
+        "scan": lambda: client.access_points(args.device),
+        "activate": lambda: client.activate(args.activate),
+    }
+
+def measure(operation, iterations):
+    operation()  # Warm up: imports, bus connection, device lookups
+    latencies = []
+    forks_before = forks()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - started)
+    return {
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "forks_per_call": round((forks() - forks_before) / iterations, 2),
+    }
+
+def write_fakes(directory, args):
+    fakes = {"sudo": FAKE_SUDO, "nmcli": FAKE_NMCLI, "iwlist": FAKE_IWLIST.format(networks=args.networks)}
+    for name, content in fakes.items():
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o755)
+
+def make_clients(args):
+    """Uncached and cached clients on the same bus."""
+    if args.fake:
+        bus = FakeSystemBus(FakeNetworkManager.example(args.latency_ms / 1000, args.networks))
+    else:
+        shared = shared_client()
+        if shared is None:
+            raise SystemExit("NetworkManager is not reachable over D-Bus; is python3-dbus installed?")
+        bus = shared.bus
+    return {"dbus": NetworkManagerClient(bus), "dbus_cached": NetworkManagerClient(bus, CACHE_TTL)}
+
+def run_benchmark(args):
+    operations = list(OPERATIONS) + (["activate"] if args.activate else [])
+    backends = {name: dbus_operations(client, args) for name, client in make_clients(args).items()}
+    backends["subprocess"] = subprocess_operations(args)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="licn-nm-bench-") as directory:
+        if args.fake:
+            write_fakes(directory, args)
+            os.environ["PATH"] = f"{directory}:{os.environ.get('PATH', '')}"
+        for operation in operations:
+            results[operation] = {
+                backend: measure(calls[operation], args.iterations) for backend, calls in backends.items()
+            }
+    return {"fake": args.fake, "iterations": args.iterations, "operations": results}
+
+def print_report(result):
+    print(f"{'fake' if result['fake'] else 'real'} NetworkManager, {result['iterations']} calls per operation")
+    for operation, backends in result["operations"].items():
+        for backend, stats in backends.items():
+            print(f"  {operation:<12} {backend:<12} mean {stats['mean_ms']:>9} ms  "
+                  f"p95 {stats['p95_ms']:>9} ms  {stats['forks_per_call']:>5} forks/call")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NetworkManager over D-Bus against nmcli/iwlist.")
+    parser.add_argument("--fake", action="store_true", help="use an in-process NetworkManager and fake commands")
+    parser.add_argument("--iterations", type=int, default=50, help="calls per operation and backend")
+    parser.add_argument("--device", default="wlan0", help="Wi-Fi device to query and scan")
+    parser.add_argument("--activate", metavar="CONNECTION", help="also benchmark bringing CONNECTION up")
+    parser.add_argument("--networks", type=int, default=20, help="access points the fakes report")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="round trip of every fake D-Bus call")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+if __name__ == "__main__":
+    main()
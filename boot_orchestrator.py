@@ -0,0 +1,263 @@
+"""Boot orchestrator started by decide_script.sh.
+
+Runs readiness probes (X display, network, NetworkManager, Bluetooth) in parallel and starts
+each step of the internet or no-internet pipeline as soon as its own prerequisites are met,
+instead of sleeping a fixed 30 seconds and deciding from a single ping. Connectivity keeps
+being re-checked afterwards and the mode is switched when it changes; an outage upstream of
+a Wi-Fi link that is still up does not bring up the hotspot. Every milestone is written to a
+boot timeline report.
+"""
+import asyncio
+import json
+import os
+import signal
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMELINE_PATH = os.path.join(BASE_DIR, "boot_timeline.json")
+
+PROBE_INTERVAL = 0.5  # Seconds between attempts of a probe that is not ready yet
+NETWORK_DEADLINE = 30  # Seconds to wait for connectivity before starting the no-internet mode
+NETWORK_PROBE_HOST = ("8.8.8.8", 53)  # Reached with a TCP connect, no ping process needed
+NETWORK_PROBE_TIMEOUT = 3
+RECHECK_INTERVAL = 15  # Seconds between connectivity checks once a mode is running
+LOST_AFTER = 3  # Consecutive checks without a network link before internet mode is abandoned
+LINK_TYPES = ("wifi", "ethernet")  # Device types whose connection counts as a network link
+HOTSPOT_CONNECTION = "Hotspot"  # Our own access point, not a link to a network
+STOP_TIMEOUT = 5  # Seconds a stopped process group gets before it is killed
+
+class Timeline:
+    """Boot milestones, measured from this process start and from power-on."""
+
+    def __init__(self, path=TIMELINE_PATH):
+        self.path = path
+        self.started = time.monotonic()
+        self.uptime_at_start = _read_uptime()
+        self.events = []
+
+    def mark(self, event, **details):
+        since_start = time.monotonic() - self.started
+        entry = {
+            "event": event,
+            "since_start": round(since_start, 3),
+            "since_power_on": round(self.uptime_at_start + since_start, 3) if self.uptime_at_start else None,
+            **details,
+        }
+        self.events.append(entry)
+        print(f"[{entry['since_start']:7.2f}s] {event}" + (f" {details}" if details else ""))
+        self.write()
+
+    def write(self):
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"events": self.events}, f, indent=2)
+        except OSError as e:
+            print(f"Could not write boot timeline: {e}")
+
+def _read_uptime():
+    try:
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError):
+        return None
+
+async def _run(*command):
+    """Runs a command and returns (exit code, stdout)."""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError:
+        return 127, ""
+    stdout, _ = await process.communicate()
+    return process.returncode, stdout.decode(errors='replace')
+
+async def probe_display():
+    """The X server accepts connections on its Unix socket."""
+    display = os.environ.get("DISPLAY", ":0")
+    number = display.split(":")[-1].split(".")[0]
+    try:
+        _, writer = await asyncio.open_unix_connection(f"/tmp/.X11-unix/X{number}")
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+async def probe_network():
+    """The internet is reachable."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(*NETWORK_PROBE_HOST), NETWORK_PROBE_TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+async def probe_link():
+    """NetworkManager has a client connection up, whether or not the internet answers through it."""
+    code, output = await _run("nmcli", "-t", "-f", "TYPE,STATE,CONNECTION", "device")
+    if code != 0:
+        return False
+    for line in output.splitlines():
+        kind, state, connection = (line.split(":", 2) + ["", ""])[:3]
+        if kind in LINK_TYPES and state == "connected" and connection != HOTSPOT_CONNECTION:
+            return True
+    return False
+
+async def probe_networkmanager():
+    """NetworkManager is running and answering."""
+    code, output = await _run("nmcli", "-t", "-f", "RUNNING", "general")
+    return code == 0 and output.strip() == "running"
+
+async def probe_bluetooth():
+    """A Bluetooth adapter is present and powered."""
+    if not any(name.startswith("hci") for name in _list_dir("/sys/class/bluetooth")):
+        return False
+    code, output = await _run("bluetoothctl", "show")
+    return code == 0 and "Powered: yes" in output
+
+def _list_dir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+PROBES = {
+    "display": probe_display,
+    "network": probe_network,
+    "networkmanager": probe_networkmanager,
+    "bluetooth": probe_bluetooth,
+}
+
+# Each step: (name, probes it waits for, kind, target). "service" steps are started with
+# systemctl, "process" steps are launched from a directory under BASE_DIR.
+PIPELINES = {
+    "internet": [
+        ("nginx", ("network",), "service", "nginx.service"),
+        ("raspberryApi", ("network",), "service", "raspberryApi.service"),
+        ("connect_to_pico", ("network", "networkmanager", "bluetooth"), "service", "connect_to_pico.service"),
+        ("chromium", ("network", "display"), "process", ("internet/chromium", ["bash", "start_chormium.sh"])),
+    ],
+    "no_internet": [
+        ("advertise_adress", ("display", "networkmanager"), "process",
+         ("no_internet", ["python3", "advertise_adress.py"])),
+    ],
+}
+USER_FACING_STEPS = {"chromium", "advertise_adress"}  # The device is usable once one of these is up
+
+async def _stop_process_group(process):
+    """Terminates a step's whole process group, e.g. Chromium started by start_chormium.sh."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return  # Every process of the group has already exited
+    deadline = time.monotonic() + STOP_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        try:
+            os.killpg(process.pid, 0)
+        except ProcessLookupError:
+            break
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+class BootOrchestrator:
+    def __init__(self):
+        self.timeline = Timeline()
+        self.ready = {name: asyncio.Event() for name in PROBES}
+        self.mode = None
+        self._steps = []  # Tasks starting the current mode's steps
+        self._processes = []  # Processes launched by the current mode
+        self._services = []  # Services started by the current mode
+        self._usable = False
+
+    async def _watch(self, name, probe):
+        """Retries a probe until it succeeds once."""
+        while not await probe():
+            await asyncio.sleep(PROBE_INTERVAL)
+        self.timeline.mark(f"{name} ready")
+        self.ready[name].set()
+
+    async def _start_step(self, name, requires, kind, target):
+        for requirement in requires:
+            await self.ready[requirement].wait()
+
+        if kind == "service":
+            code, _ = await _run("sudo", "systemctl", "start", target)
+            self._services.append(target)
+            self.timeline.mark(f"{name} started", ok=code == 0)
+        else:
+            directory, command = target
+            # A session of its own, so stopping the step also stops what its script launched
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=os.path.join(BASE_DIR, directory), start_new_session=True
+            )
+            self._processes.append(process)
+            self.timeline.mark(f"{name} started", pid=process.pid)
+
+        if name in USER_FACING_STEPS and not self._usable:
+            self._usable = True
+            self.timeline.mark("usable", mode=self.mode)
+
+    async def _enter(self, mode):
+        await self._leave()
+        self.mode = mode
+        self.timeline.mark(f"entering {mode} mode")
+        self._steps = [asyncio.create_task(self._start_step(*step)) for step in PIPELINES[mode]]
+
+    async def _leave(self):
+        """Stops whatever the current mode started."""
+        for task in self._steps:
+            task.cancel()
+        await asyncio.gather(*self._steps, return_exceptions=True)
+        for process in self._processes:
+            await _stop_process_group(process)
+        for service in self._services:
+            await _run("sudo", "systemctl", "stop", service)
+        if self.mode:
+            self.timeline.mark(f"left {self.mode} mode")
+        self._steps, self._processes, self._services = [], [], []
+
+    async def run(self):
+        watchers = [asyncio.create_task(self._watch(name, probe)) for name, probe in PROBES.items()]
+        try:
+            try:
+                await asyncio.wait_for(self.ready["network"].wait(), NETWORK_DEADLINE)
+                await self._enter("internet")
+            except asyncio.TimeoutError:
+                if await probe_link():
+                    # The hotspot would drop the link; the internet steps start once it answers
+                    self.timeline.mark("network not reachable, link up", waited=NETWORK_DEADLINE)
+                    await self._enter("internet")
+                else:
+                    self.timeline.mark("network not reachable", waited=NETWORK_DEADLINE)
+                    await self._enter("no_internet")
+
+            failures = 0
+            while True:
+                await asyncio.sleep(RECHECK_INTERVAL)
+                online = await probe_network()
+                if self.mode == "no_internet":
+                    if online:
+                        self.timeline.mark("connectivity restored")
+                        await self._enter("internet")
+                    continue
+
+                # A router or ISP outage leaves the link up, and the hotspot would only drop it
+                failures = 0 if online or await probe_link() else failures + 1
+                if failures >= LOST_AFTER:
+                    self.timeline.mark("link lost", checks=failures)
+                    failures = 0
+                    await self._enter("no_internet")
+        finally:
+            for task in watchers:
+                task.cancel()
+
+if __name__ == "__main__":
+    # decide_script.sh exports these; keep GUI steps working when started another way
+    os.environ.setdefault("DISPLAY", ":0")
+    os.environ.setdefault("XAUTHORITY", "/home/licenta/.Xauthority")
+    asyncio.run(BootOrchestrator().run())
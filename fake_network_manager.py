@@ -0,0 +1,194 @@
+"""In-process stand-in for NetworkManager's D-Bus API.
+
+FakeSystemBus answers the property reads and method calls NetworkManagerClient makes, with
+objects laid out under the same paths as the real service, so the client runs unchanged
+without a system bus:
+
+    client = NetworkManagerClient(FakeSystemBus(FakeNetworkManager.example()))
+
+Only the parts of the API the client uses are modelled. Scans complete synchronously and,
+like the real service, are refused while the device is running a hotspot.
+"""
+import time
+import uuid
+
+from network_manager import (
+    ACTIVE_IFACE,
+    ACTIVATED,
+    ACTIVATING,
+    AP_FLAG_PRIVACY,
+    AP_IFACE,
+    CONNECTION_IFACE,
+    DEVICE_IFACE,
+    IP4_IFACE,
+    NM_IFACE,
+    NM_PATH,
+    NM_SETTINGS_PATH,
+    WIFI_SECURITY,
+    WIFI_TYPE,
+    WIRELESS_IFACE,
+)
+
+class FakeNetworkManager:
+    """Connection profiles, devices and access points, plus a count of the calls served."""
+
+    def __init__(self, call_latency=0.0, activation_delay=0.0):
+        self.call_latency = call_latency  # Seconds added to every call, to model bus round trips
+        self.activation_delay = activation_delay  # Seconds an activated connection stays "activating"
+        self.calls = 0
+        self.connections = []  # Dicts with id, uuid, type, ssid, psk, mode, interface
+        self.interfaces = []
+        self.ips = {}  # interface -> IPv4 address
+        self.access_points = []  # Dicts with interface, ssid, bssid, strength, frequency and flags
+        self.active = []  # (connection index, interface)
+        self.activated_at = {}  # connection index -> monotonic time its activation completes
+        self.last_scan = {}  # interface -> counter bumped by every scan
+
+    @classmethod
+    def example(cls, call_latency=0.0, networks=10):
+        """A Pi connected to a home network with a hotspot profile and `networks` visible APs."""
+        nm = cls(call_latency)
+        nm.add_device("wlan0", "192.168.1.50")
+        nm.add_connection("Home", ssid="HomeNet", psk="home-password", interface="wlan0")
+        nm.add_connection("Hotspot", ssid="Input Wifi Here", psk="hotspot-password", mode="ap", interface="wlan0")
+        nm.activate("Home")
+        for i in range(networks):
+            nm.add_access_point("wlan0", f"Network {i}", f"AA:BB:CC:DD:EE:{i:02X}", 90 - i * 5, 2412 + (i % 11) * 5,
+                                rsn_flags=0x100 if i % 3 else 0)
+        return nm
+
+    def add_device(self, interface, ip=None):
+        self.interfaces.append(interface)
+        if ip:
+            self.ips[interface] = ip
+        self.last_scan[interface] = 0
+
+    def add_connection(self, connection_id, ssid, psk=None, mode="infrastructure", interface="wlan0"):
+        self.connections.append({
+            "id": connection_id, "uuid": str(uuid.uuid4()), "type": WIFI_TYPE,
+            "ssid": ssid, "psk": psk, "mode": mode, "interface": interface,
+        })
+
+    def add_access_point(self, interface, ssid, bssid, strength, frequency, rsn_flags=0x100, wpa_flags=0):
+        self.access_points.append({
+            "interface": interface, "ssid": ssid, "bssid": bssid, "strength": strength, "frequency": frequency,
+            "flags": AP_FLAG_PRIVACY if rsn_flags or wpa_flags else 0, "wpa_flags": wpa_flags, "rsn_flags": rsn_flags,
+        })
+
+    def activate(self, connection_id):
+        index = next(i for i, c in enumerate(self.connections) if c["id"] == connection_id)
+        interface = self.connections[index]["interface"]
+        # One connection per device, as in NetworkManager
+        self.active = [(i, iface) for i, iface in self.active if iface != interface] + [(index, interface)]
+
+    def _hotspot_on(self, interface):
+        return any(iface == interface and self.connections[i]["mode"] == "ap" for i, iface in self.active)
+
+    # Object paths, laid out like NetworkManager's
+    def _settings_path(self, index):
+        return f"{NM_SETTINGS_PATH}/{index}"
+
+    def _device_path(self, interface):
+        return f"{NM_PATH}/Devices/{self.interfaces.index(interface)}"
+
+    def _resolve(self, path):
+        """(kind, index) for an object path."""
+        if path in (NM_PATH, NM_SETTINGS_PATH):
+            return path, None
+        parent, _, index = path.rpartition("/")
+        return parent, int(index)
+
+    def properties(self, path, interface):
+        self._serve()
+        kind, index = self._resolve(path)
+        if kind == NM_PATH and interface == NM_IFACE:
+            return {"ActiveConnections": [f"{NM_PATH}/ActiveConnection/{i}" for i in range(len(self.active))]}
+        if kind == f"{NM_PATH}/ActiveConnection" and interface == ACTIVE_IFACE:
+            connection_index, iface = self.active[index]
+            connection = self.connections[connection_index]
+            return {
+                "Id": connection["id"], "Uuid": connection["uuid"], "Type": connection["type"],
+                "Devices": [self._device_path(iface)], "Connection": self._settings_path(connection_index),
+                "State": ACTIVATING if time.monotonic() < self.activated_at.get(connection_index, 0) else ACTIVATED,
+            }
+        if kind == f"{NM_PATH}/Devices":
+            iface = self.interfaces[index]
+            if interface == DEVICE_IFACE:
+                ip4 = f"{NM_PATH}/IP4Config/{index}" if iface in self.ips else "/"
+                return {"Interface": iface, "Ip4Config": ip4}
+            if interface == WIRELESS_IFACE:
+                return {"LastScan": self.last_scan[iface]}
+        if kind == f"{NM_PATH}/IP4Config" and interface == IP4_IFACE:
+            return {"AddressData": [{"address": self.ips[self.interfaces[index]], "prefix": 24}]}
+        if kind == f"{NM_PATH}/AccessPoint" and interface == AP_IFACE:
+            ap = self.access_points[index]
+            return {
+                "Ssid": list(ap["ssid"].encode()), "HwAddress": ap["bssid"], "Strength": ap["strength"],
+                "Frequency": ap["frequency"], "Flags": ap["flags"], "WpaFlags": ap["wpa_flags"],
+                "RsnFlags": ap["rsn_flags"],
+            }
+        raise LookupError(f"No interface {interface} on {path}")
+
+    def call(self, path, interface, method, *args):
+        self._serve()
+        kind, index = self._resolve(path)
+        if kind == NM_PATH and method == "GetDeviceByIpIface":
+            if args[0] not in self.interfaces:
+                raise LookupError(f"No device found for the requested iface {args[0]}")
+            return self._device_path(args[0])
+        if kind == NM_PATH and method == "ActivateConnection":
+            _, connection_index = self._resolve(args[0])
+            self.activate(self.connections[connection_index]["id"])
+            self.activated_at[connection_index] = time.monotonic() + self.activation_delay
+            return f"{NM_PATH}/ActiveConnection/{len(self.active) - 1}"
+        if kind == NM_SETTINGS_PATH and method == "ListConnections":
+            return [self._settings_path(i) for i in range(len(self.connections))]
+        if kind == NM_SETTINGS_PATH and interface == CONNECTION_IFACE:
+            connection = self.connections[index]
+            if method == "GetSettings":
+                return {
+                    "connection": {"id": connection["id"], "uuid": connection["uuid"], "type": connection["type"]},
+                    WIFI_TYPE: {"ssid": list(connection["ssid"].encode()), "mode": connection["mode"]},
+                }
+            if method == "GetSecrets":
+                return {args[0]: {"psk": connection["psk"]}} if args[0] == WIFI_SECURITY else {}
+        if kind == f"{NM_PATH}/Devices" and interface == WIRELESS_IFACE:
+            iface = self.interfaces[index]
+            if method == "RequestScan":
+                if self._hotspot_on(iface):
+                    raise RuntimeError("Scanning not allowed while in AP mode")
+                self.last_scan[iface] += 1
+                return None
+            if method == "GetAllAccessPoints":
+                return [f"{NM_PATH}/AccessPoint/{i}" for i, ap in enumerate(self.access_points) if ap["interface"] == iface]
+        raise LookupError(f"No method {interface}.{method} on {path}")
+
+    def _serve(self):
+        self.calls += 1
+        if self.call_latency:
+            time.sleep(self.call_latency)
+
+class _FakeProxy:
+    """The subset of a dbus-python proxy object NetworkManagerClient uses."""
+
+    def __init__(self, nm, path):
+        self._nm = nm
+        self._path = path
+
+    def Get(self, interface, name, dbus_interface=None):
+        return self._nm.properties(self._path, interface)[name]
+
+    def GetAll(self, interface, dbus_interface=None):
+        return self._nm.properties(self._path, interface)
+
+    def get_dbus_method(self, method, dbus_interface=None):
+        return lambda *args: self._nm.call(self._path, dbus_interface, method, *args)
+
+class FakeSystemBus:
+    """Looks like dbus.SystemBus() to NetworkManagerClient and serves a FakeNetworkManager."""
+
+    def __init__(self, nm=None):
+        self.nm = nm or FakeNetworkManager.example()
+
+    def get_object(self, service, path):
+        return _FakeProxy(self.nm, str(path))
@@ -0,0 +1,191 @@
+"""Provisioning benchmark against simulated Picos; needs no Bluetooth hardware.
+
+Runs the real uart_communication() loop over pico_emulator boards and reports time to
+first discovery, end-to-end time per device and devices per minute. With --ip-change the
+Pi's IP changes once every board is provisioned, and the time until every board holds the
+new IP is reported too; provisioned boards stop advertising, so it has to be pushed to them.
+
+Usage:
+    python3 bench_provisioning.py --boards 20 --mode frame --loss 0.02 --json
+    python3 bench_provisioning.py --mode frame --firmware legacy   # fallback for older boards
+    python3 bench_provisioning.py --firmware text --password pw34567890   # text-only boards
+    python3 bench_provisioning.py --drop-reply ACK:FRAME   # every board loses its first frame ACK
+    python3 bench_provisioning.py --boards 20 --ip-change
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# Keep benchmark runs out of the real ledger; must be set before connect_to_pico is imported
+os.environ["LICN_LEDGER_PATH"] = os.path.join(tempfile.mkdtemp(prefix="licn-bench-"), "ledger.db")
+
+import connect_to_pico
+import repo_root  # noqa: F401 - puts the repository root, home of bench_common, on sys.path
+from bench_common import percentile
+from network_watcher import NetworkSnapshot, NetworkStateWatcher
+from pico_emulator import EmulatedTransport, SimulatedPico
+from provisioning_log import configure_logging
+from provisioning_metrics import metrics
+
+BENCH_SSID = "BenchNet"
+BENCH_PASSWORD = "bench-password"
+BENCH_IP = "192.0.2.10"
+CHANGED_IP = "192.0.2.20"
+
+class ChangingNetwork(NetworkStateWatcher):
+    """Stands in for the nmcli monitor watcher and reports one IP change when `changed` is set."""
+    changed = None  # asyncio.Event, created by run_benchmark
+
+    async def run(self):
+        await self.changed.wait()
+        await self.refresh()
+
+def build_boards(args):
+    firmware = args.firmware or ("legacy" if args.mode == "legacy" else "frame")
+    return [
+        SimulatedPico(
+            address=f"AA:00:00:00:{i // 256:02X}:{i % 256:02X}",
+            name=f"LICN-{i:03d}",
+            rssi=random.randint(-90, -40),
+            mtu=args.mtu,
+            firmware=firmware,
+            connect_latency=args.connect_ms / 1000,
+            link_latency=args.latency_ms / 1000,
+            packet_loss=args.loss,
+            disconnect_rate=args.disconnect_rate,
+            drop_replies={reply: args.drop_reply.count(reply) for reply in args.drop_reply},
+        )
+        for i in range(args.boards)
+    ]
+
+async def run_benchmark(args):
+    """Provisions every simulated board once and returns the measured figures."""
+    boards = build_boards(args)
+    transport = EmulatedTransport(boards)
+    connect_to_pico.TRANSPORT = transport
+    connect_to_pico.TRANSFER_MODE = args.mode
+    connect_to_pico.MAX_CONCURRENT_SESSIONS = args.concurrency
+    adapters = [f"hci{i}" for i in range(args.adapters)] if args.adapters > 1 else [None]
+    connect_to_pico.list_bluetooth_adapters = lambda: adapters
+    connect_to_pico.METRICS_PORT = 0
+    connect_to_pico.get_ip_address = lambda: BENCH_IP
+    connect_to_pico.read_network_snapshot = lambda: NetworkSnapshot(BENCH_SSID, args.password, CHANGED_IP)
+    ChangingNetwork.changed = asyncio.Event()
+    connect_to_pico.NetworkStateWatcher = ChangingNetwork
+    connect_to_pico.WATCH_NETWORK = args.ip_change
+
+    async def wait_until(condition):
+        while time.monotonic() - started < args.timeout:
+            if condition() or session.done():
+                return
+            await asyncio.sleep(0.01)
+
+    started = time.monotonic()
+    session = asyncio.create_task(connect_to_pico.uart_communication(BENCH_SSID, args.password))
+    # Sessions still open may yet fail although their board holds the frame; let them finish
+    await wait_until(lambda: all(board.provisioned_at for board in boards) and not transport.open_clients)
+    ip_change = None
+    if args.ip_change:
+        changed_at = time.monotonic()
+        ChangingNetwork.changed.set()
+        await wait_until(
+            lambda: all(board.fields.get("IP") == CHANGED_IP for board in boards) and not transport.open_clients
+        )
+        ip_change = {
+            "updated": sum(1 for board in boards if board.fields.get("IP") == CHANGED_IP),
+            "seconds": round(time.monotonic() - changed_at, 3),
+        }
+    session.cancel()
+    await asyncio.gather(session, return_exceptions=True)
+
+    done = [board for board in boards if board.provisioned_at]
+    per_device = [board.provisioned_at - transport.first_advertised[board.address] for board in done]
+    finished = max((board.provisioned_at for board in done), default=started)
+    elapsed = finished - started
+    first_discovery = min(transport.first_advertised.values(), default=started) - started
+    return {
+        "mode": args.mode,
+        "firmware": boards[0].firmware if boards else None,
+        "dropped_replies": args.drop_reply,
+        "boards": args.boards,
+        "provisioned": len(done),
+        "adapters": args.adapters,
+        "concurrency": args.concurrency,
+        "time_to_first_discovery_ms": round(first_discovery * 1000, 1),
+        "per_device_ms": {
+            "mean": round(statistics.mean(per_device) * 1000, 1) if per_device else None,
+            "p50": round(percentile(per_device, 50) * 1000, 1) if per_device else None,
+            "p95": round(percentile(per_device, 95) * 1000, 1) if per_device else None,
+            "max": round(max(per_device) * 1000, 1) if per_device else None,
+        },
+        "total_seconds": round(elapsed, 3),
+        "devices_per_minute": round(len(done) / elapsed * 60, 1) if elapsed > 0 else None,
+        "connects": transport.connects,
+        "failed_sessions": metrics.sessions["failure"],
+        "disconnects": transport.disconnects,
+        "ip_change": ip_change,
+        "phase_mean_ms": {
+            phase: round(histogram.total / histogram.count * 1000, 2)
+            for phase, histogram in metrics.phases.items() if histogram.count
+        },
+    }
+
+def print_report(result):
+    per_device = result["per_device_ms"]
+    print(f"Mode {result['mode']} ({result['firmware']} firmware): {result['provisioned']}/{result['boards']} boards provisioned "
+          f"in {result['total_seconds']}s ({result['adapters']} adapter(s), "
+          f"{result['concurrency']} sessions each)")
+    print(f"  Time to first discovery: {result['time_to_first_discovery_ms']} ms")
+    print(f"  Per device: mean {per_device['mean']} ms, p50 {per_device['p50']} ms, "
+          f"p95 {per_device['p95']} ms, max {per_device['max']} ms")
+    print(f"  Throughput: {result['devices_per_minute']} devices/min")
+    print(f"  Connects: {result['connects']}, failed sessions: {result['failed_sessions']}, "
+          f"simulated disconnects: {result['disconnects']}")
+    if result["dropped_replies"]:
+        print(f"  Replies lost on purpose per board: {', '.join(result['dropped_replies'])}")
+    if result["ip_change"]:
+        print(f"  IP change: {result['ip_change']['updated']}/{result['boards']} boards updated "
+              f"in {result['ip_change']['seconds']}s")
+    print("  Mean per phase: " + ", ".join(f"{phase} {ms} ms" for phase, ms in result["phase_mean_ms"].items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Pico provisioning against simulated boards.")
+    parser.add_argument("--boards", type=int, default=20, help="number of simulated Picos")
+    parser.add_argument("--mode", choices=("frame", "ack", "legacy"), default="frame", help="TRANSFER_MODE to use")
+    parser.add_argument("--firmware", choices=("frame", "text", "legacy"),
+                        help="firmware the boards run, by default the one matching --mode")
+    parser.add_argument("--concurrency", type=int, default=connect_to_pico.MAX_CONCURRENT_SESSIONS,
+                        help="sessions per adapter")
+    parser.add_argument("--adapters", type=int, default=1, help="number of simulated adapters")
+    parser.add_argument("--mtu", type=int, default=185, help="negotiated ATT MTU")
+    parser.add_argument("--latency-ms", type=float, default=5, help="per write/notification latency")
+    parser.add_argument("--connect-ms", type=float, default=50, help="connection setup latency")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="link drop probability per write")
+    parser.add_argument("--drop-reply", action="append", default=[], metavar="LINE",
+                        help="reply line each board loses once, e.g. ACK:FRAME; repeat to lose more")
+    parser.add_argument("--password", default=BENCH_PASSWORD,
+                        help="Wi-Fi password sent; its length shapes the frame bytes")
+    parser.add_argument("--ip-change", action="store_true",
+                        help="change the IP once every board is provisioned and time the update")
+    parser.add_argument("--timeout", type=float, default=300, help="give up after this many seconds")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for reproducible runs")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the provisioning log")
+    args = parser.parse_args()
+
+    configure_logging("INFO" if args.verbose else "ERROR")
+    random.seed(args.seed)
+    result = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+if __name__ == "__main__":
+    main()
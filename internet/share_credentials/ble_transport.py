@@ -0,0 +1,18 @@
+"""Transport used by connect_to_pico.py for every BLE scanner and client it creates.
+
+BleakTransport talks to real hardware. pico_emulator.EmulatedTransport offers the same two
+factory methods over simulated boards, so the provisioning code can run without Bluetooth.
+"""
+
+class BleakTransport:
+    """Real Bluetooth through Bleak; bleak is only imported once a scanner or client is needed."""
+
+    def create_scanner(self, detection_callback, adapter=None):
+        from bleak import BleakScanner
+        adapter_kwargs = {"adapter": adapter} if adapter else {}
+        return BleakScanner(detection_callback=detection_callback, **adapter_kwargs)
+
+    def create_client(self, address, adapter=None):
+        from bleak import BleakClient
+        adapter_kwargs = {"adapter": adapter} if adapter else {}
+        return BleakClient(address, **adapter_kwargs)
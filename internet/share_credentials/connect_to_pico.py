@@ -1,9 +1,31 @@
 import asyncio
+import contextlib
+import heapq
+import logging
+import re
 import socket
-from bleak import BleakScanner, BleakClient
+import time
+from dataclasses import dataclass
 import subprocess
+import sys
 import os
-import configparser
+from ble_transport import BleakTransport
+from provisioning_log import configure_logging, redactor
+from provisioning_metrics import metrics
+from network_watcher import NetworkSnapshot, NetworkStateWatcher
+from provisioning_ledger import ProvisioningLedger
+from provisioning_frame import (
+    FRAME_ACK_LABEL,
+    build_frame,
+    build_resume_request,
+    split_into_chunks,
+)
+
+import repo_root  # noqa: F401 - puts the repository root, home of the modules below, on sys.path
+from network_manager import NetworkManagerError, shared_client
+from startup_profile import profile_and_exit, report_ready
+
+log = logging.getLogger("connect_to_pico")
 
 # UUIDs for Nordic UART Service (NUS)
 UART_SERVICE_UUID = "6e400001-b5a3-f393-e0a9-e50e24dcca9e"
@@ -12,12 +34,58 @@ UART_TX_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"  # Notify
 
 DEVICE_PREFIX = "LICN"  # Prefix for BLE devices to search for
 CONNECTION_TIMEOUT = 120  # Timeout for BLE connection attempts in seconds
+MAX_CONCURRENT_SESSIONS = 4  # Number of Picos provisioned at the same time
+TRANSPORT = BleakTransport()  # Replaced by pico_emulator.EmulatedTransport in benchmarks
+
+# "frame" sends one binary frame confirmed once, "ack" sends three text fields confirmed
+# one by one, "legacy" sends three text fields with fixed sleeps for older firmware.
+# Boards that never answer a request of "frame" or "ack" mode are served with "legacy" instead.
+TRANSFER_MODE = "frame"
+ACK_TIMEOUT = 2.0  # Seconds to wait for an ACK line before resending a field
+ACK_RETRIES = 3  # Attempts per field before the session is failed
+WRITE_WINDOW = 8  # Writes without response sent before a confirmed write flushes the queue
+ATT_HEADER_SIZE = 3  # Bytes of every ATT packet used by the opcode and handle
+RECONNECT_GRACE = 10  # Seconds to reconnect by address after a drop before giving up on the session
+RECONNECT_ATTEMPTS = 3  # Direct reconnects per session before the device goes back to the scanner
+
+RSSI_RECENCY_WEIGHT = 1.0  # dB of priority a device loses for every second it has not been heard
+CANDIDATE_TTL = 30  # Seconds without an advertisement before a device leaves the queue
+BACKOFF_BASE = 5  # Seconds before retrying a device after its first failure, doubled per failure
+BACKOFF_MAX = 300  # Upper bound for the per-device retry delay in seconds
+QUARANTINE_AFTER = 5  # Consecutive failures before a device is quarantined
+QUARANTINE_SECONDS = 1800  # How long a quarantined device is ignored
+CONNECT_TIMEOUT_PERCENTILE = 95  # Percentile of observed connect latencies used as the timeout
+CONNECT_TIMEOUT_MARGIN = 2.0  # Multiplier applied to that percentile
+MIN_CONNECT_TIMEOUT = 10  # Adaptive connect timeouts never go below this many seconds
+MIN_LATENCY_SAMPLES = 5  # Connects observed before the timeout starts adapting
+LATENCY_WINDOW = 50  # Most recent connect latencies kept for the percentile
+
+WATCH_NETWORK = True  # Follow NetworkManager and push changed credentials/IP to provisioned boards
+METRICS_PORT = 9105  # Port serving /metrics and /metrics.json, 0 to disable
+METRICS_DUMP_PATH = None  # JSON file rewritten with the metrics every METRICS_DUMP_INTERVAL seconds
+METRICS_DUMP_INTERVAL = 60
+
+BLUETOOTH_SYSFS = "/sys/class/bluetooth"  # Where the kernel lists local HCI adapters
+ADAPTER_LOAD_PENALTY = 10  # dB of signal an adapter must win by per extra session it is running
 
 def get_wifi_credentials():
     """Robust version that handles all password types and formats"""
     try:
+        # Method 0: Ask NetworkManager over D-Bus, without forking nmcli
+        nm = shared_client()
+        if nm:
+            # Called again whenever the network changes, so never answer from the cache
+            nm.invalidate()
+            try:
+                ssid, password = nm.wifi_credentials()
+                if ssid and password:
+                    log.info("✅ Got credentials from NetworkManager over D-Bus")
+                    return ssid, password
+            except NetworkManagerError as e:
+                log.info("D-Bus lookup failed (%s), trying nmcli...", e)
+
         # Method 1: Try to get credentials using nmcli directly (most reliable)
-        print("Attempting to get credentials using nmcli...")
+        log.info("Attempting to get credentials using nmcli...")
         
         # Get active WiFi connection name
         cmd = ['nmcli', '-t', '-f', 'NAME,TYPE', 'connection', 'show', '--active']
@@ -30,10 +98,10 @@ def get_wifi_credentials():
                 break
         
         if not wifi_connection:
-            print("No active WiFi connection found")
+            log.warning("No active WiFi connection found")
             return None, None
         
-        print(f"Active WiFi connection: {wifi_connection}")
+        log.info("Active WiFi connection: %s", wifi_connection)
         
         # Try to get password directly from nmcli (works for most cases)
         try:
@@ -47,13 +115,13 @@ def get_wifi_credentials():
             ssid_from_nmcli = result.stdout.strip()
             
             if password_from_nmcli and ssid_from_nmcli:
-                print(f"✅ Got credentials from nmcli directly")
-                print(f"SSID: '{ssid_from_nmcli}' (length: {len(ssid_from_nmcli)})")
-                print(f"Password length: {len(password_from_nmcli)}")
+                log.info("✅ Got credentials from nmcli directly")
+                log.info("SSID: '%s' (length: %d)", ssid_from_nmcli, len(ssid_from_nmcli))
+                log.info("Password length: %d", len(password_from_nmcli))
                 return ssid_from_nmcli, password_from_nmcli
                 
         except subprocess.CalledProcessError:
-            print("Direct nmcli method failed, trying file parsing...")
+            log.info("Direct nmcli method failed, trying file parsing...")
         
         # Method 2: Parse the connection file (fallback)
         file_path = f"/etc/NetworkManager/system-connections/{wifi_connection}.nmconnection"
@@ -66,13 +134,13 @@ def get_wifi_credentials():
             try:
                 with open(file_path, 'r', encoding=encoding) as f:
                     content = f.read()
-                print(f"✅ Successfully read file with {encoding} encoding")
+                log.info("✅ Successfully read file with %s encoding", encoding)
                 break
             except UnicodeDecodeError:
                 continue
         
         if not content:
-            print("❌ Could not read file with any encoding")
+            log.error("❌ Could not read file with any encoding")
             return None, None
         
         # Parse for SSID and password with multiple fallback methods
@@ -81,7 +149,7 @@ def get_wifi_credentials():
         
         # Try configparser first (handles quotes and escaping properly)
         try:
-            import io
+            import configparser
             config = configparser.ConfigParser()
             config.read_string(content)
             
@@ -91,7 +159,7 @@ def get_wifi_credentials():
                 password = config['wifi-security']['psk']
                 
         except Exception as e:
-            print(f"ConfigParser failed: {e}, trying manual parsing...")
+            log.info("ConfigParser failed: %s, trying manual parsing...", e)
         
         # Manual parsing as fallback
         if not ssid or not password:
@@ -110,22 +178,22 @@ def get_wifi_credentials():
         
         # Validate and return
         if ssid and password:
-            print(f"✅ SSID: '{ssid}' (length: {len(ssid)})")
-            print(f"✅ Password length: {len(password)}")
+            log.info("✅ SSID: '%s' (length: %d)", ssid, len(ssid))
+            log.info("✅ Password length: %d", len(password))
             # Don't print actual password for security
             return ssid, password
         else:
-            print(f"❌ Missing credentials - SSID: {bool(ssid)}, Password: {bool(password)}")
+            log.error("❌ Missing credentials - SSID: %s, Password: %s", bool(ssid), bool(password))
             return None, None
         
     except FileNotFoundError:
-        print(f"❌ Connection file not found: {file_path}")
+        log.error("❌ Connection file not found: %s", file_path)
         return None, None
     except PermissionError:
-        print("❌ Permission denied. Run with sudo.")
+        log.error("❌ Permission denied. Run with sudo.")
         return None, None
     except Exception as e:
-        print(f"❌ Error: {e}")
+        log.error("❌ Error: %s", e)
         return None, None
 
 def _clean_credential_value(value):
@@ -160,129 +228,822 @@ def get_ip_address():
         s.close()
         return ip_address
     except Exception as e:
-        print(f"Error getting IP address: {e}")
+        log.error("Error getting IP address: %s", e)
         return "0.0.0.0"
 
-async def find_licn_device():
-    """Continuously scan for BLE devices whose names start with LICN."""
-    print("Scanning for BLE devices with prefix LICN...")
-    while True:
-        devices = await BleakScanner.discover()
+def read_network_snapshot():
+    """Reads the current credentials and IP, or None if the credentials are unavailable."""
+    ssid, password = get_wifi_credentials()
+    if not ssid or not password:
+        return None
+    return NetworkSnapshot(ssid, password, get_ip_address())
+
+@dataclass
+class DiscoveredDevice:
+    """A LICN board seen by the scanner, updated with every advertisement."""
+    address: str
+    name: str
+    rssi: int
+    first_seen: float
+    last_seen: float
+
+def _is_licn_advertisement(device, advertisement_data):
+    """Checks the advertised name prefix and, when present, the NUS service UUID."""
+    name = advertisement_data.local_name or device.name
+    if not name or not name.startswith(DEVICE_PREFIX):
+        return False
+    service_uuids = [uuid.lower() for uuid in advertisement_data.service_uuids or []]
+    # Some firmware puts the UUID only in the scan response; accept those too
+    return not service_uuids or UART_SERVICE_UUID in service_uuids
+
+class LicnDeviceStream:
+    """Continuous BLE scan that reports every LICN advertisement to a listener.
+
+    Usage:
+        async with LicnDeviceStream(listener=on_device):
+            ...
+    """
+
+    def __init__(self, listener=None, adapter=None):
+        self.devices = {}  # address -> DiscoveredDevice, de-duplicated
+        self.listener = listener  # Called with the DiscoveredDevice on every matching advertisement
+        self.adapter = adapter  # HCI adapter name, None for the system default
+        self._scanner = TRANSPORT.create_scanner(self._on_advertisement, adapter)
+
+    def _on_advertisement(self, device, advertisement_data):
+        if not _is_licn_advertisement(device, advertisement_data):
+            return
+
+        now = time.monotonic()
+        known = self.devices.get(device.address)
+        if known:
+            # Already known, only keep the latest signal strength
+            known.rssi = advertisement_data.rssi
+            known.last_seen = now
+            if self.listener:
+                self.listener(known)
+            return
+
+        name = advertisement_data.local_name or device.name
+        discovered = DiscoveredDevice(device.address, name, advertisement_data.rssi, now, now)
+        self.devices[device.address] = discovered
+        log.info("Found %s: %s (RSSI %d)", name, device.address, discovered.rssi)
+        if self.listener:
+            self.listener(discovered)
+
+    async def start(self):
+        log.info("Scanning for BLE devices with prefix %s on %s...", DEVICE_PREFIX, self.adapter or "default adapter")
+        await self._scanner.start()
+
+    async def stop(self):
+        await self._scanner.stop()
 
-        for device in devices:
-            if device.name and device.name.startswith(DEVICE_PREFIX):
-                print(f"Found {device.name}: {device.address}")
-                return device.address
+    async def __aenter__(self):
+        await self.start()
+        return self
 
-        print("No LICN devices found. Retrying in 2 seconds...")
-        await asyncio.sleep(2)  # Wait before scanning again
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+class DeviceQueue:
+    """Candidate devices ordered by signal strength and recency, with per-address backoff.
+
+    The priority rssi - RSSI_RECENCY_WEIGHT * (now - last_seen) orders devices the same way
+    at any moment as rssi + RSSI_RECENCY_WEIGHT * last_seen, so heap keys never go stale.
+    """
+
+    def __init__(self):
+        self._heap = []  # (key, address, device), superseded entries are skipped lazily
+        self._keys = {}  # address -> key of its live heap entry
+        self._taken = set()  # Addresses handed out and not yet reported back
+        self._health = {}  # address -> {"failures": n, "not_before": monotonic time}
+        self._changed = asyncio.Event()
+
+    def offer(self, device):
+        """Adds or refreshes a candidate from its latest advertisement."""
+        if device.address in self._taken:
+            return
+
+        key = -(device.rssi + RSSI_RECENCY_WEIGHT * device.last_seen)
+        if self._keys.get(device.address) == key:
+            return
+        self._keys[device.address] = key
+        heapq.heappush(self._heap, (key, device.address, device))
+        if len(self._heap) > 4 * len(self._keys) + 16:
+            # Every advertisement pushes a new entry; drop the superseded ones now and then
+            self._heap = [entry for entry in self._heap if self._keys.get(entry[1]) == entry[0]]
+            heapq.heapify(self._heap)
+        self._changed.set()
+
+    def _pop_ready(self, now):
+        """Returns (best eligible device or None, seconds until a backed-off device is eligible)."""
+        deferred = []
+        found = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            key, address, device = entry
+            if self._keys.get(address) != key:
+                continue
+            if now - device.last_seen > CANDIDATE_TTL:
+                del self._keys[address]
+                continue
+            health = self._health.get(address)
+            if health and health["not_before"] > now:
+                deferred.append(entry)
+                continue
+
+            del self._keys[address]
+            self._taken.add(address)
+            found = device
+            break
+
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        wait = min((self._health[entry[1]]["not_before"] - now for entry in deferred), default=None)
+        return found, wait
+
+    async def get(self):
+        """Waits for the highest-priority device that is not backing off."""
+        while True:
+            device, wait = self._pop_ready(time.monotonic())
+            if device:
+                return device
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def take(self, address):
+        """Hands an address out without an advertisement, e.g. to update a board that stopped advertising."""
+        self._keys.pop(address, None)
+        self._taken.add(address)
+
+    def record_result(self, address, success):
+        """Releases the address and applies backoff or quarantine after a failure.
+
+        Returns the seconds until the address may be tried again, None after a success.
+        """
+        self._taken.discard(address)
+        if success:
+            self._health.pop(address, None)
+            return None
+
+        health = self._health.setdefault(address, {"failures": 0, "not_before": 0})
+        health["failures"] += 1
+        if health["failures"] >= QUARANTINE_AFTER:
+            delay = QUARANTINE_SECONDS
+            log.warning("🚫 %s failed %d times, quarantined for %ss", address, health["failures"], delay)
+        else:
+            delay = min(BACKOFF_BASE * 2 ** (health["failures"] - 1), BACKOFF_MAX)
+            log.info("⏳ Retrying %s in %ss", address, delay)
+        health["not_before"] = time.monotonic() + delay
+        return delay
+
+class ConnectLatencyTracker:
+    """Derives the connect timeout from a high percentile of recently observed connect times."""
+
+    def __init__(self):
+        self.samples = []
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        del self.samples[:-LATENCY_WINDOW]
+
+    def timeout(self):
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return CONNECTION_TIMEOUT
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, len(ordered) * CONNECT_TIMEOUT_PERCENTILE // 100)
+        adaptive = ordered[index] * CONNECT_TIMEOUT_MARGIN
+        return round(min(max(adaptive, MIN_CONNECT_TIMEOUT), CONNECTION_TIMEOUT), 1)
+
+connect_latencies = ConnectLatencyTracker()
+replying_boards = set()  # Addresses that have answered a request at least once this run
+legacy_boards = set()  # Addresses that never did, served with the legacy text protocol
+
+class LegacyFirmwareError(RuntimeError):
+    """The Pico has not answered any request on this link, so its firmware predates the protocol.
+
+    Such firmware either stays silent or treats the writes as text lines and answers those.
+    """
+
+class LinkDroppedError(RuntimeError):
+    """The BLE link went down in the middle of a session."""
+
+class UartLink:
+    """Flow-controlled writes to the Pico RX characteristic and reply parsing of TX notifications.
+
+    The Pico answers every complete field with an "ACK:<LABEL>" or "NACK:<LABEL>" line,
+    and resume requests with an "OFFSET:<n>" line.
+    """
+
+    def __init__(self, client, first_contact=False):
+        self.client = client
+        self.chunk_size = 20  # Safe default until the MTU is known
+        self.without_response = False
+        # On a board that has never replied, failing to get an answer raises LegacyFirmwareError
+        self.first_contact = first_contact
+        self.heard = False  # A reply to one of our requests received on this link
+        self.unmatched = False  # A line received that answers none of our requests
+        self._buffer = b""
+        self._pending = {}  # label or "OFFSET" -> future resolved by the matching reply line
+        self._requested = set()  # Every key waited for on this link, so late replies still count
+
+    async def negotiate(self):
+        """Sizes chunks to the negotiated MTU and picks the fastest supported write type."""
+        backend = getattr(self.client, "_backend", None)
+        if hasattr(backend, "_acquire_mtu"):
+            # BlueZ only reports the real MTU after it has been acquired explicitly
+            try:
+                await backend._acquire_mtu()
+            except Exception as e:
+                log.warning("Could not acquire MTU, keeping %d-byte chunks: %s", self.chunk_size, e)
+
+        char = self.client.services.get_characteristic(UART_RX_CHAR_UUID)
+        self.without_response = char is not None and "write-without-response" in char.properties
+        if char is not None and self.without_response:
+            self.chunk_size = char.max_write_without_response_size
+        else:
+            self.chunk_size = max(self.chunk_size, self.client.mtu_size - ATT_HEADER_SIZE)
+        log.debug("MTU %d: %d-byte chunks, %s response", self.client.mtu_size, self.chunk_size,
+                  "without" if self.without_response else "with")
+
+    def notification_handler(self, sender, data):
+        """Handles incoming BLE UART data from the Pico W, one line at a time."""
+        self._buffer += data
+        while b"\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            try:
+                message = line.decode().strip()
+            except Exception as e:
+                log.warning("Error decoding response: %s", e)
+                self.unmatched = True
+                continue
+
+            log.debug("Received from Pico: %s", message)
+            status, _, value = message.partition(":")
+            if status in ("ACK", "NACK") and value in self._requested:
+                self.heard = True
+                self._resolve(value, status == "ACK")
+            elif status == "OFFSET" and value.isdigit() and "OFFSET" in self._requested:
+                self.heard = True
+                self._resolve("OFFSET", int(value))
+            else:
+                # E.g. text-only firmware acknowledging a piece of a binary frame as a line
+                self.unmatched = True
+
+    def _expect(self, key):
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        self._requested.add(key)
+        return future
+
+    def _resolve(self, key, result):
+        future = self._pending.get(key)
+        if future and not future.done():
+            future.set_result(result)
+
+    def _check_firmware(self, attempt):
+        """Raises LegacyFirmwareError once a board on first contact has shown it cannot answer."""
+        if not self.first_contact or self.heard:
+            return
+        # Stray lines prove it at once; silence only after two attempts, so a single lost reply
+        # does not demote the board
+        if self.unmatched or attempt >= 2:
+            raise LegacyFirmwareError("Pico has not answered any request, its firmware predates the protocol")
+
+    async def write_chunks(self, chunks):
+        """Writes pre-sized chunks, pacing unconfirmed writes with a window."""
+        for index, chunk in enumerate(chunks, start=1):
+            # Every WRITE_WINDOW-th chunk and the last one are confirmed so the queue cannot overflow
+            confirm = not self.without_response or index % WRITE_WINDOW == 0 or index == len(chunks)
+            await self.client.write_gatt_char(UART_RX_CHAR_UUID, chunk, response=confirm)
+
+    async def write(self, payload):
+        """Writes the payload in MTU-sized chunks."""
+        await self.write_chunks([payload[i:i + self.chunk_size] for i in range(0, len(payload), self.chunk_size)])
+
+    async def send_and_confirm(self, label, payload):
+        """Writes the payload until the Pico acknowledges it, retrying on timeout or NACK."""
+        for attempt in range(1, ACK_RETRIES + 1):
+            future = self._expect(label)
+            try:
+                await self.write(payload)
+                with metrics.timer("ack_wait"):
+                    acknowledged = await asyncio.wait_for(future, ACK_TIMEOUT)
+                if acknowledged:
+                    return
+                log.warning("⚠️ Pico rejected %s (attempt %d/%d)", label, attempt, ACK_RETRIES)
+            except asyncio.TimeoutError:
+                self._check_firmware(attempt)
+                log.warning("⚠️ No ACK for %s within %ss (attempt %d/%d)", label, ACK_TIMEOUT, attempt, ACK_RETRIES)
+            finally:
+                self._pending.pop(label, None)
+
+        raise RuntimeError(f"Pico did not acknowledge {label} after {ACK_RETRIES} attempts")
+
+    async def query_offset(self, frame):
+        """Resume handshake: asks how many bytes of this frame the Pico already holds, None if it
+        does not answer."""
+        future = self._expect("OFFSET")
+        try:
+            await self.client.write_gatt_char(UART_RX_CHAR_UUID, build_resume_request(frame), response=True)
+            offset = await asyncio.wait_for(future, ACK_TIMEOUT)
+            return offset if offset <= len(frame) else 0
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop("OFFSET", None)
+
+    async def send_frame_resumable(self, frame):
+        """Sends sequence-numbered chunks from the Pico's last offset until it acknowledges the frame.
+
+        On first contact nothing is sent before the Pico has answered the resume request, so
+        firmware that cannot parse frames never receives the credentials as stray text lines.
+        """
+        for attempt in range(1, ACK_RETRIES + 1):
+            # The ACK may already be on its way if the Pico finished before a drop
+            future = self._expect(FRAME_ACK_LABEL)
+            try:
+                offset = await self.query_offset(frame)
+                if offset is None:
+                    self._check_firmware(attempt)
+                    if self.first_contact and not self.heard:
+                        log.warning("⚠️ Pico did not answer the resume request (attempt %d/%d)", attempt, ACK_RETRIES)
+                        continue
+                    log.warning("⚠️ Pico did not answer the resume request, sending from the start")
+                    offset = 0
+                if offset == len(frame):
+                    # The Pico validated the whole frame earlier and only its ACK was lost
+                    log.info("↩️ Pico already holds the frame")
+                    return
+                if offset:
+                    log.info("↩️ Resuming frame at byte %d/%d", offset, len(frame))
+                await self.write_chunks(list(split_into_chunks(frame, self.chunk_size, offset)))
+                with metrics.timer("ack_wait"):
+                    acknowledged = await asyncio.wait_for(future, ACK_TIMEOUT)
+                if acknowledged:
+                    return
+                log.warning("⚠️ Pico rejected %s (attempt %d/%d)", FRAME_ACK_LABEL, attempt, ACK_RETRIES)
+            except asyncio.TimeoutError:
+                self._check_firmware(attempt)
+                log.warning("⚠️ No ACK for %s within %ss (attempt %d/%d)", FRAME_ACK_LABEL, ACK_TIMEOUT, attempt, ACK_RETRIES)
+            finally:
+                self._pending.pop(FRAME_ACK_LABEL, None)
+
+        raise RuntimeError(f"Pico did not acknowledge {FRAME_ACK_LABEL} after {ACK_RETRIES} attempts")
+
+async def send_data_acked(link, label, data):
+    """Sends a labeled message and returns once the Pico has confirmed it."""
+    log.debug("=== SENDING %s (%d characters) ===", label, len(data))
+    try:
+        with metrics.timer(f"transfer_{label.lower()}"):
+            await link.send_and_confirm(label, f"{label}:{data}\n".encode('utf-8'))
+        log.debug("✅ Pico acknowledged %s", label)
+    except LegacyFirmwareError:
+        raise
+    except Exception as e:
+        log.error("❌ Error sending %s: %s", label, e)
+        raise
+
+async def send_frame(link, frame):
+    """Sends the binary provisioning frame and returns once the Pico has validated it."""
+    log.debug("=== SENDING PROVISIONING FRAME (%d bytes) ===", len(frame))
+    try:
+        with metrics.timer("transfer_frame"):
+            await link.send_frame_resumable(frame)
+        log.debug("✅ Pico acknowledged the provisioning frame")
+    except LegacyFirmwareError:
+        raise
+    except Exception as e:
+        log.error("❌ Error sending provisioning frame: %s", e)
+        raise
 
 async def send_data(client, label, data):
     """Sends a labeled message (SSID, PASSWORD, IP) - simple and reliable."""
     # Create message - keep it simple
     message = f"{label}:{data}\n"
-    
-    print(f"=== SENDING {label} ===")
-    print(f"Raw data: '{data}'")
-    print(f"Data length: {len(data)} characters")
-    print(f"Complete message: '{message}'")
-    print(f"Message length: {len(message)} characters")
-    
+    log.debug("=== SENDING %s (%d characters) ===", label, len(data))
+
     try:
-        # Convert to bytes
-        message_bytes = message.encode('utf-8')
-        print(f"Encoded bytes length: {len(message_bytes)}")
-        print(f"Bytes hex: {message_bytes.hex()}")
-        print(f"Bytes as list: {list(message_bytes)}")
-        
-        # For longer messages, send in smaller chunks to ensure reliability
-        chunk_size = 20  # Conservative chunk size for BLE
-        
-        if len(message_bytes) <= chunk_size:
-            # Send as single message
-            await client.write_gatt_char(UART_RX_CHAR_UUID, message_bytes)
-            print(f"✅ Sent as single message")
-        else:
-            # Send in small chunks
-            print(f"📦 Sending in chunks of {chunk_size} bytes...")
-            for i in range(0, len(message_bytes), chunk_size):
-                chunk = message_bytes[i:i + chunk_size]
-                print(f"   Chunk {i//chunk_size + 1}: {len(chunk)} bytes - {chunk.hex()}")
-                await client.write_gatt_char(UART_RX_CHAR_UUID, chunk)
-                await asyncio.sleep(0.1)  # Small delay between chunks
-        
-        print(f"✅ Successfully wrote to BLE characteristic")
-        await asyncio.sleep(3)  # Longer wait for acknowledgment
-        
+        with metrics.timer(f"transfer_{label.lower()}"):
+            # Convert to bytes
+            message_bytes = message.encode('utf-8')
+
+            # For longer messages, send in smaller chunks to ensure reliability
+            chunk_size = 20  # Conservative chunk size for BLE
+
+            if len(message_bytes) <= chunk_size:
+                # Send as single message
+                await client.write_gatt_char(UART_RX_CHAR_UUID, message_bytes)
+                log.debug("✅ Sent as single message (%d bytes)", len(message_bytes))
+            else:
+                # Send in small chunks
+                log.debug("📦 Sending %d bytes in chunks of %d bytes...", len(message_bytes), chunk_size)
+                for i in range(0, len(message_bytes), chunk_size):
+                    chunk = message_bytes[i:i + chunk_size]
+                    log.debug("   Chunk %d: %d bytes", i // chunk_size + 1, len(chunk))
+                    await client.write_gatt_char(UART_RX_CHAR_UUID, chunk)
+                    await asyncio.sleep(0.1)  # Small delay between chunks
+
+            log.debug("✅ Successfully wrote to BLE characteristic")
+        with metrics.timer("ack_wait"):
+            await asyncio.sleep(3)  # Longer wait for acknowledgment
+
     except Exception as e:
-        print(f"❌ Error sending {label}: {e}")
+        log.error("❌ Error sending %s: %s", label, e)
         raise
 
-async def connect_and_send_data(pico_address, ssid, password):
-    """Attempt to connect to device and send data with timeout."""
-    try:
-        print(f"Attempting to connect to {pico_address} (timeout: {CONNECTION_TIMEOUT}s)...")
-        
-        # Use asyncio.wait_for to implement the 30-second timeout
-        async with asyncio.timeout(CONNECTION_TIMEOUT):
-            async with BleakClient(pico_address) as client:
-                print(f"✅ Successfully connected to {pico_address}")
+async def _provision_connected(client, pico_address, ssid, password, ip_address=None, labels=None):
+    """Runs one provisioning exchange over an already connected client.
+
+    labels limits the transfer to some fields (a delta update for a board that already
+    holds the rest); by default SSID, PASSWORD and IP are all sent.
+    """
+    # Enable notifications
+    link = UartLink(client, first_contact=pico_address not in replying_boards)
+    with metrics.timer("notify_setup"):
+        await client.start_notify(UART_TX_CHAR_UUID, link.notification_handler)
+
+    # Get real WiFi credentials and IP
+    if ip_address is None:
+        ip_address = get_ip_address()
+
+    if not ssid or not password:
+        log.error("WiFi credentials are missing. Aborting BLE transmission.")
+        return False
 
-                def notification_handler(sender, data):
-                    """Handles incoming BLE UART data from the Pico W."""
+    fields = tuple(
+        (label, value) for label, value in (("SSID", ssid), ("PASSWORD", password), ("IP", ip_address))
+        if labels is None or label in labels
+    )
+    mode = "legacy" if pico_address in legacy_boards else TRANSFER_MODE
+    if mode != "legacy":
+        with metrics.timer("negotiate"):
+            await link.negotiate()
+        try:
+            if mode == "frame":
+                # Built once per credential snapshot and shared by every device
+                await send_frame(link, build_frame(fields))
+            else:
+                # Send each piece of data separately
+                for label, value in fields:
+                    await send_data_acked(link, label, value)
+        except LegacyFirmwareError:
+            log.warning("⚠️ %s never answered a request, falling back to the text protocol for older firmware", pico_address)
+            legacy_boards.add(pico_address)
+            mode = "legacy"
+            # Ends whatever the firmware buffered as a text line, so SSID starts a fresh one
+            await client.write_gatt_char(UART_RX_CHAR_UUID, b"\n")
+        finally:
+            if link.heard:
+                replying_boards.add(pico_address)
+    if mode == "legacy":
+        for label, value in fields:
+            await send_data(client, label, value)
+    return True
+
+async def connect_and_send_data(pico_address, ssid, password, adapter=None, ip_address=None, labels=None):
+    """Attempt to connect to device and send data with timeout.
+
+    The connect timeout adapts to observed connect latencies; once connected the session
+    gets the full CONNECTION_TIMEOUT. In frame mode a link that drops mid-transfer is
+    reconnected by address within RECONNECT_GRACE seconds and the frame resumes where the
+    Pico left off, without a rescan.
+    """
+    timeout = connect_latencies.timeout()
+    reconnects = 0
+    while True:
+        connected = False
+        try:
+            log.info("Attempting to connect to %s (timeout: %ss)...", pico_address, timeout)
+
+            started = time.monotonic()
+            async with asyncio.timeout(timeout) as deadline:
+                async with TRANSPORT.create_client(pico_address, adapter) as client:
+                    connected = True
+                    connect_latencies.record(time.monotonic() - started)
+                    metrics.observe("connect", time.monotonic() - started)
+                    deadline.reschedule(asyncio.get_running_loop().time() + CONNECTION_TIMEOUT)
+                    log.info("✅ Successfully connected to %s", pico_address)
                     try:
-                        message = data.decode()
-                        print(f"Received from Pico: {message}")
+                        success = await _provision_connected(client, pico_address, ssid, password, ip_address, labels)
+
+                        # Disconnect
+                        disconnect_started = time.monotonic()
+                        await client.stop_notify(UART_TX_CHAR_UUID)
                     except Exception as e:
-                        print(f"Error decoding response: {e}")
+                        # Only a link that is really gone is worth a reconnect; NACKs, missing
+                        # ACKs and bad frames would fail the same way again
+                        if client.is_connected:
+                            raise
+                        raise LinkDroppedError(str(e)) from e
+                metrics.observe("disconnect", time.monotonic() - disconnect_started)
+                if success:
+                    log.info("✅ Successfully sent data and disconnected from %s", pico_address)
+                return success
 
-                # Enable notifications
-                await client.start_notify(UART_TX_CHAR_UUID, notification_handler)
+        except asyncio.TimeoutError:
+            phase = "session" if connected else "connection"
+            log.error("❌ %s to %s timed out after %s seconds", phase.capitalize(), pico_address,
+                      CONNECTION_TIMEOUT if connected else timeout)
+            return False
+        except Exception as e:
+            dropped = isinstance(e, LinkDroppedError)
+            # A reconnect that fails to connect gets the remaining attempts too
+            resumable = TRANSFER_MODE == "frame" and pico_address not in legacy_boards and (
+                dropped or (reconnects and not connected)
+            )
+            if not resumable or reconnects >= RECONNECT_ATTEMPTS:
+                log.error("❌ Connection to %s failed: %s", pico_address, e)
+                return False
 
-                # Get real WiFi credentials and IP
-                ip_address = get_ip_address()
+            reconnects += 1
+            timeout = RECONNECT_GRACE
+            log.warning("⚠️ Link to %s dropped (%s), reconnecting (%d/%d)...",
+                        pico_address, e, reconnects, RECONNECT_ATTEMPTS)
 
-                if not ssid or not password:
-                    print("WiFi credentials are missing. Aborting BLE transmission.")
-                    return False
+class ProvisioningScheduler:
+    """Runs several connect_and_send_data sessions at once, bounded by a concurrency limit."""
 
-                # Send each piece of data separately
-                await send_data(client, "SSID", ssid)
-                await send_data(client, "PASSWORD", password)
-                await send_data(client, "IP", ip_address)
+    def __init__(self, ssid, password, max_concurrent=None, on_done=None, adapter=None):
+        self.ssid = ssid
+        self.password = password
+        self.max_concurrent = max_concurrent or MAX_CONCURRENT_SESSIONS
+        self.adapter = adapter  # HCI adapter the sessions connect through, None for the default
+        self.on_done = on_done  # Called with (address, success) after each session
+        self.in_flight = set()
+        self.results = {}  # address -> {"successes": n, "failures": n}
+        self.started_at = time.monotonic()
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._tasks = set()
 
-                # Disconnect
-                await client.stop_notify(UART_TX_CHAR_UUID)
-                print(f"✅ Successfully sent data and disconnected from {pico_address}")
-                return True
+    def submit(self, address, snapshot=None, labels=None):
+        """Schedules a session for the address unless one is already in flight.
 
-    except asyncio.TimeoutError:
-        print(f"❌ Connection to {pico_address} timed out after {CONNECTION_TIMEOUT} seconds")
-        return False
-    except Exception as e:
-        print(f"❌ Connection to {pico_address} failed: {e}")
-        return False
+        snapshot overrides the scheduler's credentials and supplies the IP; labels limits
+        the session to the fields that changed.
+        """
+        if address in self.in_flight:
+            return False
+
+        self.in_flight.add(address)
+        task = asyncio.create_task(self._run_session(address, snapshot, labels))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run_session(self, address, snapshot, labels):
+        success = False
+        ssid, password, ip_address = (
+            (snapshot.ssid, snapshot.password, snapshot.ip_address) if snapshot else (self.ssid, self.password, None)
+        )
+        try:
+            async with self._slots:
+                success = await connect_and_send_data(address, ssid, password, self.adapter, ip_address, labels)
+        finally:
+            counts = self.results.setdefault(address, {"successes": 0, "failures": 0})
+            counts["successes" if success else "failures"] += 1
+            self.in_flight.discard(address)
+            if self.on_done:
+                self.on_done(address, success)
+
+    def has_free_slot(self):
+        return len(self.in_flight) < self.max_concurrent
+
+    async def close(self):
+        """Cancels any sessions still running."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def summary(self):
+        """Returns throughput and per-address outcomes for this run."""
+        elapsed = time.monotonic() - self.started_at
+        provisioned = sum(1 for counts in self.results.values() if counts["successes"])
+        return {
+            "adapter": self.adapter or "default",
+            "elapsed_seconds": round(elapsed, 1),
+            "devices_provisioned": provisioned,
+            "devices_per_minute": round(provisioned / (elapsed / 60), 2) if elapsed > 0 else 0.0,
+            "per_address": self.results,
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        log.info("📊 [%s] Provisioned %d device(s) in %ss (%s devices/min)", summary["adapter"],
+                 summary["devices_provisioned"], summary["elapsed_seconds"], summary["devices_per_minute"])
+        for address, counts in summary["per_address"].items():
+            log.info("   %s: %d ok, %d failed", address, counts["successes"], counts["failures"])
+
+def list_bluetooth_adapters():
+    """Returns the local HCI adapter names, or [None] to use the default adapter."""
+    try:
+        names = [name for name in os.listdir(BLUETOOTH_SYSFS) if re.fullmatch(r"hci\d+", name)]
+    except OSError:
+        names = []
+    return sorted(names, key=lambda name: int(name[3:])) or [None]
+
+class AdapterPool:
+    """One scheduler per Bluetooth adapter; each device goes to the adapter that hears it best."""
+
+    def __init__(self, adapters, ssid, password, on_done=None):
+        self.on_done = on_done
+        self.schedulers = {
+            adapter: ProvisioningScheduler(ssid, password, on_done=self._session_done, adapter=adapter)
+            for adapter in adapters
+        }
+        self.sightings = {}  # address -> {adapter: DiscoveredDevice}
+        self._slot_freed = asyncio.Event()
+
+    @property
+    def in_flight(self):
+        return set().union(*(scheduler.in_flight for scheduler in self.schedulers.values()))
+
+    def observe(self, adapter, device):
+        """Remembers which adapter heard the device and returns its strongest recent sighting."""
+        sightings = self.sightings.setdefault(device.address, {})
+        sightings[adapter] = device
+        now = time.monotonic()
+        recent = [d for d in sightings.values() if now - d.last_seen <= CANDIDATE_TTL] or [device]
+        return max(recent, key=lambda d: d.rssi)
+
+    def _pick_adapter(self, address):
+        """Scores adapters with a free slot by signal heard minus a penalty for their load."""
+        now = time.monotonic()
+        sightings = self.sightings.get(address, {})
+
+        def score(adapter):
+            sighting = sightings.get(adapter)
+            # Adapters that never heard the device can still connect, but only as a last resort
+            rssi = sighting.rssi if sighting and now - sighting.last_seen <= CANDIDATE_TTL else -200
+            return rssi - ADAPTER_LOAD_PENALTY * len(self.schedulers[adapter].in_flight)
+
+        # Updates pushed by address do not wait for a slot; they queue on the best adapter
+        free = [adapter for adapter, scheduler in self.schedulers.items() if scheduler.has_free_slot()]
+        return max(free or self.schedulers, key=score)
+
+    def submit(self, address, snapshot=None, labels=None):
+        adapter = self._pick_adapter(address)
+        if len(self.schedulers) > 1:
+            log.debug("📡 %s assigned to %s", address, adapter)
+        return self.schedulers[adapter].submit(address, snapshot, labels)
+
+    def _session_done(self, address, success):
+        self._slot_freed.set()
+        if self.on_done:
+            self.on_done(address, success)
+
+    async def wait_for_slot(self):
+        """Waits until any adapter can start a session."""
+        while not any(scheduler.has_free_slot() for scheduler in self.schedulers.values()):
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+
+    async def close(self):
+        await asyncio.gather(*(scheduler.close() for scheduler in self.schedulers.values()))
+
+    def print_summary(self):
+        """Prints per-adapter throughput so the gain from an extra dongle is visible."""
+        summaries = [scheduler.summary() for scheduler in self.schedulers.values()]
+        if len(summaries) > 1:
+            total = sum(summary["devices_per_minute"] for summary in summaries)
+            log.info("📊 %d adapters: %s devices/min in total", len(summaries), round(total, 2))
+        for scheduler in self.schedulers.values():
+            scheduler.print_summary()
 
 async def uart_communication(ssid, password):
-    """Continuously looks for LICN devices and sends WiFi credentials."""
-    while True:
-        pico_address = await find_licn_device()
-        if not pico_address:
-            continue  # If no device found, restart the scan loop
+    """Continuously looks for LICN devices and sends WiFi credentials, best signal first.
 
-        # Attempt connection with longer timeout
-        success = await connect_and_send_data(pico_address, ssid, password)
-        
+    Every local Bluetooth adapter runs its own scanner and connection slots.
+    Devices the ledger shows already hold the current credentials are skipped at scan time.
+    Boards the ledger shows hold other credentials, from this run or an earlier one, are
+    updated by address at startup and whenever the network changes, since provisioned boards
+    may no longer advertise: the fields that changed if the snapshot they hold is from this
+    run, the full set otherwise.
+    """
+    redactor.register(password)
+    adapters = list_bluetooth_adapters()
+    log.info("Using Bluetooth adapter(s): %s", ", ".join(a or "default" for a in adapters))
+
+    ledger = ProvisioningLedger()
+    snapshot = NetworkSnapshot(ssid, password, get_ip_address())
+    history = {snapshot.hash: snapshot}  # Snapshots seen this run, to work out deltas
+    sending = {}  # address -> snapshot being delivered
+    candidates = DeviceQueue()
+    retries = {}  # address -> timer handle of an update pushed again after a failure
+
+    def dispatch(address):
+        """Starts a session sending the board what it is missing from the current snapshot."""
+        entry = ledger.entries.get(address)
+        held = history.get(entry.credential_hash) if entry else None
+        labels = snapshot.changed_fields(held) if held else None
+        if labels:
+            log.info("🔁 Updating %s on %s", ", ".join(labels), address)
+        sending[address] = snapshot
+        pool.submit(address, snapshot, labels or None)
+
+    def holds_older_snapshot(address):
+        entry = ledger.entries.get(address)
+        return entry is not None and entry.credential_hash not in (None, snapshot.hash)
+
+    def push_update(address):
+        """Updates a provisioned board holding older credentials, without waiting for it to advertise."""
+        if address in pool.in_flight or not holds_older_snapshot(address):
+            return
+        candidates.take(address)
+        dispatch(address)
+
+    def network_changed(old, new):
+        nonlocal snapshot
+        redactor.register(new.password)
+        history[new.hash] = new
+        snapshot = new
+        for address in list(ledger.entries):
+            push_update(address)
+
+    def retry_update(address):
+        del retries[address]
+        push_update(address)
+
+    def session_done(address, success):
         if success:
-            print("✅ Data transmission completed successfully")
+            log.info("✅ Data transmission to %s completed successfully", address)
         else:
-            print("❌ Failed to connect or send data")
+            log.warning("❌ Failed to connect or send data to %s", address)
+
+        ledger.record(address, sending.pop(address).hash, success)
+        metrics.record_session(success)
+        delay = candidates.record_result(address, success)
+        if success:
+            # The network may have changed again while this session ran
+            push_update(address)
+        elif holds_older_snapshot(address) and address not in retries:
+            # Boards that stopped advertising are only reached by pushing again
+            retries[address] = asyncio.get_running_loop().call_later(delay, retry_update, address)
+        if not pool.in_flight:
+            pool.print_summary()
+            log.info("🔄 Waiting for new LICN devices...")
+
+    pool = AdapterPool(adapters, ssid, password, on_done=session_done)
+
+    def offer(adapter, device):
+        if not ledger.is_current(device.address, snapshot.hash):
+            candidates.offer(pool.observe(adapter, device))
+
+    async with contextlib.AsyncExitStack() as scanners:
+        for adapter in adapters:
+            listener = lambda device, adapter=adapter: offer(adapter, device)
+            await scanners.enter_async_context(LicnDeviceStream(listener=listener, adapter=adapter))
+        report_ready()
+        for address in list(ledger.entries):
+            # The network may have changed while this script was not running
+            push_update(address)
+
+        background = [asyncio.create_task(ledger.run_flusher())]
+        if WATCH_NETWORK:
+            watcher = NetworkStateWatcher(read_network_snapshot, snapshot, on_change=network_changed)
+            background.append(asyncio.create_task(watcher.run()))
+        if METRICS_PORT:
+            background.append(asyncio.create_task(metrics.serve(METRICS_PORT)))
+        if METRICS_DUMP_PATH:
+            background.append(asyncio.create_task(metrics.dump_periodically(METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL)))
+        dispatched = set()
+        try:
+            while True:
+                # Pick the device only once a slot is free, so priorities reflect the latest scan
+                await pool.wait_for_slot()
+                device = await candidates.get()
+                if device.address not in dispatched:
+                    # Time from the first advertisement to the first session for this board
+                    dispatched.add(device.address)
+                    metrics.observe("scan", time.monotonic() - device.first_seen)
+
+                dispatch(device.address)
+        finally:
+            for handle in retries.values():
+                handle.cancel()
+            await pool.close()
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            ledger.close()
+            pool.print_summary()
+
+def main():
+    if "--profile-startup" in sys.argv[1:]:
+        # Re-run under the profiler, which stops the script once scanning has started
+        profile_and_exit(__file__)
 
-        print("\n🔄 Restarting scan for new LICN devices...\n")
+    configure_logging()
+    ssid, password = get_wifi_credentials()
+    if not ssid or not password:
+        log.error("WiFi credentials are missing. Please ensure you are connected to a WiFi network.")
+        exit(1)
+    asyncio.run(uart_communication(ssid, password))
 
 # Run the script
-ssid, password = get_wifi_credentials()
-if not ssid or not password:
-    print("WiFi credentials are missing. Please ensure you are connected to a WiFi network.")
-    exit(1)
-asyncio.run(uart_communication(ssid, password))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
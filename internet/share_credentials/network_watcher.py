@@ -0,0 +1,106 @@
+"""Cached Wi-Fi credential and IP snapshot, refreshed only when NetworkManager reports a change.
+
+A single long-running `nmcli monitor` process is the event source. When it cannot be started
+the watcher falls back to a slow poll.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from provisioning_ledger import credential_hash
+
+log = logging.getLogger(__name__)
+
+NETWORK_DEBOUNCE = 2.0  # Seconds to let a burst of NetworkManager events settle before re-reading
+NETWORK_POLL_INTERVAL = 60  # Seconds between re-reads when nmcli monitor is unavailable
+MONITOR_RESTART_DELAY = 5  # Seconds before restarting an nmcli monitor that exited
+
+@dataclass(frozen=True)
+class NetworkSnapshot:
+    """The values a Pico is provisioned with."""
+    ssid: str
+    password: str
+    ip_address: str
+
+    @property
+    def hash(self):
+        return credential_hash(self.ssid, self.password, self.ip_address)
+
+    def fields(self):
+        return (("SSID", self.ssid), ("PASSWORD", self.password), ("IP", self.ip_address))
+
+    def changed_fields(self, older):
+        """Labels whose value differs from an older snapshot, e.g. ("IP",) after a new DHCP lease."""
+        return tuple(label for (label, value), (_, old) in zip(self.fields(), older.fields()) if value != old)
+
+class NetworkStateWatcher:
+    """Keeps `snapshot` current and calls on_change(old, new) whenever it changes.
+
+    read_snapshot is a blocking callable returning a NetworkSnapshot, or None when the
+    credentials cannot be read right now; it runs on a worker thread.
+    """
+
+    def __init__(self, read_snapshot, snapshot, on_change=None):
+        self.read_snapshot = read_snapshot
+        self.snapshot = snapshot
+        self.on_change = on_change
+        self._pending_refresh = None
+
+    async def refresh(self):
+        """Re-reads the snapshot and notifies on_change if anything differs."""
+        try:
+            snapshot = await asyncio.to_thread(self.read_snapshot)
+        except Exception as e:
+            log.warning("Could not read the network state: %s", e)
+            return
+        if snapshot is None or snapshot == self.snapshot:
+            return
+
+        old, self.snapshot = self.snapshot, snapshot
+        log.info("🌐 Network changed: %s", ", ".join(snapshot.changed_fields(old)))
+        if self.on_change:
+            self.on_change(old, snapshot)
+
+    async def _refresh_later(self):
+        await asyncio.sleep(NETWORK_DEBOUNCE)
+        await self.refresh()
+
+    def _schedule_refresh(self):
+        # One refresh per burst of events
+        if self._pending_refresh is None or self._pending_refresh.done():
+            self._pending_refresh = asyncio.create_task(self._refresh_later())
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(NETWORK_POLL_INTERVAL)
+            await self.refresh()
+
+    async def run(self):
+        """Follows `nmcli monitor` until cancelled, restarting it if it exits."""
+        try:
+            while True:
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        "nmcli", "monitor",
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.DEVNULL,
+                    )
+                except OSError as e:
+                    log.warning("Cannot start nmcli monitor (%s), polling every %ss", e, NETWORK_POLL_INTERVAL)
+                    await self._poll()
+                    return
+
+                try:
+                    while line := await process.stdout.readline():
+                        log.debug("NetworkManager: %s", line.decode(errors='replace').strip())
+                        self._schedule_refresh()
+                finally:
+                    if process.returncode is None:
+                        process.terminate()
+                        await process.wait()
+
+                log.warning("nmcli monitor exited, restarting in %ss", MONITOR_RESTART_DELAY)
+                await asyncio.sleep(MONITOR_RESTART_DELAY)
+        finally:
+            if self._pending_refresh:
+                self._pending_refresh.cancel()
@@ -0,0 +1,245 @@
+"""In-process emulation of LICN Picos exposing the Nordic UART Service.
+
+EmulatedTransport has the same factory methods as ble_transport.BleakTransport, so
+connect_to_pico.py can be pointed at simulated boards with:
+
+    connect_to_pico.TRANSPORT = EmulatedTransport([SimulatedPico("AA:00:00:00:00:01"), ...])
+
+Each board advertises periodically, accepts RX writes, answers on TX notifications like the
+firmware does (text fields, binary frames and resume requests) and can be configured with
+latency, MTU, packet loss, random disconnects and replies that are lost on purpose.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+
+from connect_to_pico import ATT_HEADER_SIZE, UART_SERVICE_UUID
+from provisioning_frame import (
+    CHUNK_DATA,
+    CHUNK_RESUME,
+    FIELD_TYPES,
+    FRAME_ACK_LABEL,
+    FrameError,
+    frame_size,
+    parse_chunk,
+    parse_provisioning_frame,
+    transfer_id,
+)
+
+class SimulatedDisconnect(Exception):
+    """Raised on any operation once a simulated link has dropped."""
+
+@dataclass
+class SimulatedPico:
+    """One emulated board and its firmware state, which survives reconnects."""
+    address: str
+    name: str = "LICN-SIM"
+    rssi: int = -60
+    mtu: int = 185
+    # "frame" parses frames and text lines; "text" reads every write as text lines and
+    # acknowledges each line, whatever it holds; "legacy" reads text lines and never answers
+    firmware: str = "frame"
+    advertising_interval: float = 0.1  # Seconds between advertisements
+    connect_latency: float = 0.05  # Seconds to establish a connection
+    link_latency: float = 0.005  # Seconds per write and per notification
+    packet_loss: float = 0.0  # Probability that an unconfirmed write or a notification is lost
+    disconnect_rate: float = 0.0  # Probability that the link drops on any write
+    connect_failure_rate: float = 0.0  # Probability that a connection attempt is refused
+    stop_advertising_when_provisioned: bool = True
+    drop_replies: dict = field(default_factory=dict)  # Reply line -> how many of them are lost
+
+    fields: dict = field(default_factory=dict)  # Text fields or decoded frame fields received so far
+    provisioned_at: float = None
+    updates: int = 0  # Complete frames received, including delta updates
+    _frame: bytearray = field(default_factory=bytearray)
+    _frame_id: int = None
+    _line: bytearray = field(default_factory=bytearray)
+
+    @property
+    def advertising(self):
+        return not (self.provisioned_at and self.stop_advertising_when_provisioned)
+
+    def receive(self, data):
+        """Feeds one RX write to the firmware and returns the reply lines it sends on TX."""
+        if self.firmware == "frame" and data and data[0] in (CHUNK_DATA, CHUNK_RESUME):
+            return self._receive_chunk(data)
+
+        replies = []
+        self._line.extend(data)
+        while b"\n" in self._line:
+            index = self._line.index(b"\n")
+            line, self._line = bytes(self._line[:index]), self._line[index + 1:]
+            label, _, value = line.decode('utf-8', errors='replace').partition(":")
+            self.fields[label] = value
+            if self.firmware != "legacy":
+                replies.append(f"ACK:{label}")
+        if {"SSID", "PASSWORD", "IP"} <= self.fields.keys():
+            self._provisioned()
+        return replies
+
+    def _receive_chunk(self, chunk):
+        kind, value, payload = parse_chunk(chunk)
+        if kind == CHUNK_RESUME:
+            if value != self._frame_id:
+                # A transfer the board has not seen yet starts from scratch
+                self._frame_id = value
+                self._frame = bytearray()
+            return [f"OFFSET:{len(self._frame)}"]
+
+        if value != len(self._frame):
+            # Out of order after a lost write; the Pi resumes from OFFSET on its next attempt
+            return []
+        self._frame.extend(payload)
+        try:
+            decoded = parse_provisioning_frame(bytes(self._frame))
+        except FrameError:
+            size = frame_size(self._frame)
+            if size is None or len(self._frame) < size:
+                return []  # Incomplete so far
+            self._frame = bytearray()
+            return [f"NACK:{FRAME_ACK_LABEL}"]
+        if self._frame_id is None:
+            self._frame_id = transfer_id(bytes(self._frame))
+        # Fields missing from a delta frame keep their stored value
+        for label, field_type in FIELD_TYPES.items():
+            if field_type in decoded:
+                self.fields[label] = decoded[field_type]
+        self.updates += 1
+        self._provisioned()
+        return [f"ACK:{FRAME_ACK_LABEL}"]
+
+    def drops(self, reply):
+        """True while this reply line still has to be lost, see drop_replies."""
+        remaining = self.drop_replies.get(reply, 0)
+        if remaining:
+            self.drop_replies[reply] = remaining - 1
+        return bool(remaining)
+
+    def _provisioned(self):
+        if self.provisioned_at is None:
+            self.provisioned_at = time.monotonic()
+
+class _Advertisement:
+    def __init__(self, board):
+        self.local_name = board.name
+        self.rssi = board.rssi + random.randint(-3, 3)
+        self.service_uuids = [UART_SERVICE_UUID]
+
+class _Device:
+    def __init__(self, board):
+        self.address = board.address
+        self.name = board.name
+
+class _Characteristic:
+    properties = ["write", "write-without-response"]
+
+    def __init__(self, mtu):
+        self.max_write_without_response_size = mtu - ATT_HEADER_SIZE
+
+class _Services:
+    def __init__(self, mtu):
+        self._rx = _Characteristic(mtu)
+
+    def get_characteristic(self, uuid):
+        return self._rx
+
+class SimulatedScanner:
+    """Delivers advertisements from every board to the detection callback."""
+
+    def __init__(self, transport, detection_callback):
+        self.transport = transport
+        self.detection_callback = detection_callback
+        self._tasks = []
+
+    async def _advertise(self, board):
+        # Boards power up out of phase with each other
+        await asyncio.sleep(random.uniform(0, board.advertising_interval))
+        while True:
+            if board.advertising:
+                self.transport.first_advertised.setdefault(board.address, time.monotonic())
+                self.detection_callback(_Device(board), _Advertisement(board))
+            await asyncio.sleep(board.advertising_interval)
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._advertise(board)) for board in self.transport.boards.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+class SimulatedClient:
+    """BleakClient look-alike connected to one simulated board."""
+
+    def __init__(self, transport, address):
+        self.transport = transport
+        self.board = transport.boards.get(address)
+        self.address = address
+        self.mtu_size = self.board.mtu if self.board else 23
+        self.services = _Services(self.mtu_size)
+        self.is_connected = False
+        self._notify = None
+
+    async def __aenter__(self):
+        if self.board is None:
+            raise SimulatedDisconnect(f"Device {self.address} was not found")
+        await asyncio.sleep(self.board.connect_latency)
+        if random.random() < self.board.connect_failure_rate:
+            raise SimulatedDisconnect(f"Connection to {self.address} refused")
+        self.is_connected = True
+        self.transport.connects += 1
+        self.transport.open_clients += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.is_connected = False
+        self.transport.open_clients -= 1
+
+    async def start_notify(self, uuid, callback):
+        self._check_link()
+        self._notify = callback
+
+    async def stop_notify(self, uuid):
+        self._check_link()
+        self._notify = None
+
+    def _check_link(self):
+        if not self.is_connected:
+            raise SimulatedDisconnect(f"Not connected to {self.address}")
+
+    async def write_gatt_char(self, uuid, data, response=True):
+        self._check_link()
+        await asyncio.sleep(self.board.link_latency)
+        if random.random() < self.board.disconnect_rate:
+            self.is_connected = False
+            self.transport.disconnects += 1
+            raise SimulatedDisconnect(f"Link to {self.address} dropped")
+        if not response and random.random() < self.board.packet_loss:
+            return
+
+        loop = asyncio.get_running_loop()
+        for reply in self.board.receive(bytes(data)):
+            if self.board.drops(reply) or random.random() < self.board.packet_loss:
+                continue
+            loop.call_later(self.board.link_latency, self._deliver, (reply + "\n").encode())
+
+    def _deliver(self, payload):
+        if self.is_connected and self._notify:
+            self._notify(None, bytearray(payload))
+
+class EmulatedTransport:
+    """Stand-in for BleakTransport that serves a fixed set of simulated boards."""
+
+    def __init__(self, boards):
+        self.boards = {board.address: board for board in boards}
+        self.first_advertised = {}  # address -> monotonic time of its first advertisement
+        self.connects = 0
+        self.disconnects = 0
+        self.open_clients = 0  # Sessions between connect and disconnect right now
+
+    def create_scanner(self, detection_callback, adapter=None):
+        return SimulatedScanner(self, detection_callback)
+
+    def create_client(self, address, adapter=None):
+        return SimulatedClient(self, address)
@@ -0,0 +1,132 @@
+"""Binary provisioning frame sent to the Pico in a single transfer.
+
+Layout (all integers big-endian):
+
+    magic    2 bytes  b"LC"
+    version  1 byte   FRAME_VERSION
+    length   2 bytes  size of the TLV body
+    body     TLV fields: type (1 byte), length (1 byte), UTF-8 value
+    crc32    4 bytes  CRC-32 of everything before it (binascii.crc32 on MicroPython)
+
+Values are length-prefixed, so newlines or colons inside a password cannot break the framing.
+A frame may carry only some of the fields; the Pico keeps its stored value for any field
+that is absent, which lets a changed IP be pushed on its own.
+
+On the wire the frame is split into sequence-numbered chunks so a transfer can resume
+after a disconnect:
+
+    data chunk      0x01, offset (2 bytes), frame bytes starting at that offset
+    resume request  0x02, transfer id (4 bytes, the frame CRC)
+
+The Pico answers a resume request with an "OFFSET:<n>" line giving how many bytes of that
+transfer it already holds (0 for an unknown transfer), and "ACK:FRAME" once it is complete.
+A complete frame that does not validate is answered with "NACK:FRAME" and discarded, so an
+offset equal to the frame length means the Pico holds that frame and has accepted it; the Pi
+treats it as the acknowledgement, which may have been lost.
+"""
+import binascii
+import struct
+from functools import lru_cache
+
+FRAME_MAGIC = b"LC"
+FRAME_VERSION = 1
+FRAME_ACK_LABEL = "FRAME"  # The Pico answers "ACK:FRAME" or "NACK:FRAME"
+
+FIELD_SSID = 0x01
+FIELD_PASSWORD = 0x02
+FIELD_IP = 0x03
+FIELD_TYPES = {"SSID": FIELD_SSID, "PASSWORD": FIELD_PASSWORD, "IP": FIELD_IP}
+
+CHUNK_DATA = 0x01
+CHUNK_RESUME = 0x02
+
+_HEADER = struct.Struct(">2sBH")
+_CRC = struct.Struct(">I")
+_CHUNK_HEADER = struct.Struct(">BH")
+_RESUME_REQUEST = struct.Struct(">BI")
+CHUNK_HEADER_SIZE = _CHUNK_HEADER.size
+_MAX_FIELD_LENGTH = 255
+
+class FrameError(ValueError):
+    """Raised when a frame cannot be built or does not validate."""
+
+@lru_cache(maxsize=8)
+def build_frame(fields):
+    """Builds a frame from a tuple of (label, value) pairs; repeated calls reuse the same bytes."""
+    body = b""
+    for label, value in fields:
+        field_type = FIELD_TYPES[label]
+        encoded = value.encode('utf-8')
+        if len(encoded) > _MAX_FIELD_LENGTH:
+            raise FrameError(f"Field {field_type} is {len(encoded)} bytes, limit is {_MAX_FIELD_LENGTH}")
+        body += bytes((field_type, len(encoded))) + encoded
+
+    frame = _HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(body)) + body
+    return frame + _CRC.pack(binascii.crc32(frame))
+
+def build_provisioning_frame(ssid, password, ip_address):
+    """Builds the full frame for one credential snapshot."""
+    return build_frame((("SSID", ssid), ("PASSWORD", password), ("IP", ip_address)))
+
+def parse_provisioning_frame(frame):
+    """Validates a frame in one pass and returns {field_type: value}, as the Pico does."""
+    if len(frame) < _HEADER.size + _CRC.size:
+        raise FrameError("Frame is too short")
+
+    magic, version, length = _HEADER.unpack_from(frame)
+    if magic != FRAME_MAGIC:
+        raise FrameError("Bad magic")
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    if len(frame) != _HEADER.size + length + _CRC.size:
+        raise FrameError("Length does not match header")
+
+    (crc,) = _CRC.unpack_from(frame, _HEADER.size + length)
+    if crc != binascii.crc32(frame[:_HEADER.size + length]):
+        raise FrameError("CRC mismatch")
+
+    fields = {}
+    offset = _HEADER.size
+    end = _HEADER.size + length
+    while offset < end:
+        if offset + 2 > end:
+            raise FrameError("Truncated field header")
+        field_type, field_length = frame[offset], frame[offset + 1]
+        offset += 2
+        if offset + field_length > end:
+            raise FrameError("Truncated field value")
+        fields[field_type] = frame[offset:offset + field_length].decode('utf-8')
+        offset += field_length
+    return fields
+
+def frame_size(prefix):
+    """Total size of the frame these first bytes start, None until its header has arrived."""
+    if len(prefix) < _HEADER.size:
+        return None
+    _, _, length = _HEADER.unpack_from(prefix)
+    return _HEADER.size + length + _CRC.size
+
+def transfer_id(frame):
+    """Identifies a transfer by the CRC already stored at the end of its frame."""
+    (crc,) = _CRC.unpack_from(frame, len(frame) - _CRC.size)
+    return crc
+
+def split_into_chunks(frame, chunk_size, start=0):
+    """Yields sequence-numbered data chunks of at most chunk_size bytes from the given offset."""
+    step = chunk_size - CHUNK_HEADER_SIZE
+    for offset in range(start, len(frame), step):
+        yield _CHUNK_HEADER.pack(CHUNK_DATA, offset) + frame[offset:offset + step]
+
+def build_resume_request(frame):
+    """Asks the Pico how much of this frame it already received."""
+    return _RESUME_REQUEST.pack(CHUNK_RESUME, transfer_id(frame))
+
+def parse_chunk(chunk):
+    """Splits a chunk written by the Pi into (kind, offset or transfer id, payload)."""
+    if chunk[0] == CHUNK_RESUME:
+        _, transfer = _RESUME_REQUEST.unpack_from(chunk)
+        return CHUNK_RESUME, transfer, b""
+    if chunk[0] == CHUNK_DATA:
+        _, offset = _CHUNK_HEADER.unpack_from(chunk)
+        return CHUNK_DATA, offset, chunk[CHUNK_HEADER_SIZE:]
+    raise FrameError(f"Unknown chunk type {chunk[0]}")
@@ -0,0 +1,191 @@
+"""On-disk record of which Picos already received which credentials.
+
+Usage:
+    python3 provisioning_ledger.py list
+    python3 provisioning_ledger.py clear [ADDRESS ...]
+
+A running connect_to_pico.py picks up a clear within LEDGER_FLUSH_INTERVAL seconds.
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+
+LEDGER_PATH = os.environ.get(
+    "LICN_LEDGER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "provisioning_ledger.db"),
+)
+LEDGER_FLUSH_INTERVAL = 5  # Seconds between batched writes to disk and checks for outside changes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    address TEXT PRIMARY KEY,
+    provisioned_at REAL,
+    credential_hash TEXT,
+    outcome TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+_UPSERT = """
+INSERT INTO devices (address, provisioned_at, credential_hash, outcome, updated_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(address) DO UPDATE SET
+    provisioned_at = COALESCE(excluded.provisioned_at, devices.provisioned_at),
+    credential_hash = COALESCE(excluded.credential_hash, devices.credential_hash),
+    outcome = excluded.outcome,
+    updated_at = excluded.updated_at
+"""
+
+def credential_hash(ssid, password, ip_address):
+    """Fingerprint of one credential snapshot, without storing the password itself."""
+    snapshot = "\0".join((ssid, password, ip_address)).encode('utf-8')
+    return hashlib.sha256(snapshot).hexdigest()
+
+@dataclass
+class LedgerEntry:
+    """Last known state of one device. provisioned_at and credential_hash describe the last success."""
+    address: str
+    provisioned_at: float
+    credential_hash: str
+    outcome: str
+    updated_at: float
+
+class ProvisioningLedger:
+    """SQLite ledger keyed by MAC address, mirrored in memory for O(1) lookups.
+
+    record() only touches memory; pending rows are written in one transaction by
+    flush(), which run_flusher() calls periodically off the event loop. On the same tick the
+    mirror is re-read if another process changed the database, e.g. with `clear`.
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._data_version = self._read_data_version()
+        self.entries = self._read_entries()
+        self._pending = []
+
+    def _read_entries(self):
+        return {
+            row[0]: LedgerEntry(*row)
+            for row in self._db.execute(
+                "SELECT address, provisioned_at, credential_hash, outcome, updated_at FROM devices"
+            )
+        }
+
+    def _read_data_version(self):
+        # Changes whenever another connection commits, never for this connection's own writes
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read_if_changed(self):
+        version = self._read_data_version()
+        if version == self._data_version:
+            return None
+        self._data_version = version
+        return self._read_entries()
+
+    async def reload_if_changed(self):
+        """Re-reads the mirror if another process changed the database since the last check."""
+        entries = await asyncio.to_thread(self._read_if_changed)
+        if entries is None:
+            return
+        for row in self._pending:
+            # Recorded while the rows were being read
+            entries[row[0]] = self.entries[row[0]]
+        self.entries = entries
+
+    def is_current(self, address, snapshot_hash):
+        """True if the device already confirmed the credentials with this hash."""
+        entry = self.entries.get(address)
+        return entry is not None and entry.credential_hash == snapshot_hash
+
+    def record(self, address, snapshot_hash, success):
+        """Remembers the outcome of a session; the write to disk is batched."""
+        now = time.time()
+        entry = self.entries.get(address) or LedgerEntry(address, None, None, "", now)
+        entry.outcome = "success" if success else "failed"
+        entry.updated_at = now
+        if success:
+            entry.provisioned_at = now
+            entry.credential_hash = snapshot_hash
+        self.entries[address] = entry
+        self._pending.append((
+            address,
+            now if success else None,
+            snapshot_hash if success else None,
+            entry.outcome,
+            now,
+        ))
+
+    def _write(self, rows):
+        with self._db:
+            self._db.executemany(_UPSERT, rows)
+
+    async def flush(self):
+        """Writes all pending rows in a single transaction on a worker thread."""
+        rows, self._pending = self._pending, []
+        if rows:
+            await asyncio.to_thread(self._write, rows)
+
+    async def run_flusher(self, interval=LEDGER_FLUSH_INTERVAL):
+        """Flushes pending rows and picks up outside changes every interval seconds until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush()
+                await self.reload_if_changed()
+        finally:
+            # Cancelled on shutdown: write whatever is left synchronously
+            rows, self._pending = self._pending, []
+            if rows:
+                self._write(rows)
+
+    def clear(self, addresses=None):
+        """Forgets the given addresses, or every device when none are given."""
+        with self._db:
+            if addresses:
+                self._db.executemany("DELETE FROM devices WHERE address = ?", [(a,) for a in addresses])
+                for address in addresses:
+                    self.entries.pop(address, None)
+            else:
+                self._db.execute("DELETE FROM devices")
+                self.entries.clear()
+
+    def close(self):
+        self._db.close()
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or reset the Pico provisioning ledger.")
+    parser.add_argument("--path", default=LEDGER_PATH, help="ledger database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show every known device")
+    clear_parser = commands.add_parser("clear", help="forget devices so they are provisioned again")
+    clear_parser.add_argument("addresses", nargs="*", help="MAC addresses to forget (default: all)")
+    args = parser.parse_args()
+
+    ledger = ProvisioningLedger(args.path)
+    try:
+        if args.command == "list":
+            print(f"{'ADDRESS':<18} {'OUTCOME':<8} {'PROVISIONED':<19} {'UPDATED':<19} CREDENTIALS")
+            for entry in sorted(ledger.entries.values(), key=lambda e: e.updated_at, reverse=True):
+                print(f"{entry.address:<18} {entry.outcome:<8} {_format_time(entry.provisioned_at):<19} "
+                      f"{_format_time(entry.updated_at):<19} {(entry.credential_hash or '-')[:12]}")
+        else:
+            ledger.clear(args.addresses)
+            print(f"Cleared {', '.join(args.addresses) if args.addresses else 'all devices'}")
+    finally:
+        ledger.close()
+
+if __name__ == "__main__":
+    main()
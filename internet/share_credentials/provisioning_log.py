@@ -0,0 +1,44 @@
+"""Logging setup for the provisioning scripts.
+
+Messages use logging's lazy %-formatting, so disabled levels cost no string work on the BLE
+path. Registered secrets are masked before any handler writes a record.
+"""
+import logging
+import os
+
+LOG_LEVEL = os.environ.get("LICN_LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+REDACTED = "***"
+
+class SecretRedactor(logging.Filter):
+    """Replaces registered secret values (e.g. the Wi-Fi password) in formatted messages."""
+
+    def __init__(self):
+        super().__init__()
+        self.secrets = set()
+
+    def register(self, secret):
+        if secret:
+            self.secrets.add(secret)
+
+    def filter(self, record):
+        if not self.secrets:
+            return True
+        message = record.getMessage()
+        redacted = message
+        for secret in self.secrets:
+            redacted = redacted.replace(secret, REDACTED)
+        if redacted != message:
+            record.msg, record.args = redacted, ()
+        return True
+
+redactor = SecretRedactor()
+
+def configure_logging(level=LOG_LEVEL):
+    """Sends log records to stderr (and so the journal) with secrets masked."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(redactor)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -0,0 +1,139 @@
+"""Per-phase timing histograms for the BLE provisioning path.
+
+Exposed as Prometheus text on /metrics and as JSON on /metrics.json, and optionally dumped
+to a JSON file at a fixed interval.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a single write up to the full connection timeout
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+METRIC_PREFIX = "licn_provisioning"
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            running += count
+            yield bound, running
+
+class ProvisioningMetrics:
+    """Phase histograms and outcome counters shared by every provisioning session."""
+
+    def __init__(self):
+        self.phases = {}  # phase name -> Histogram
+        self.errors = {}  # phase name -> count of phases that raised
+        self.sessions = {"success": 0, "failure": 0}
+
+    def observe(self, phase, seconds):
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases[phase] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, phase):
+        """Times the enclosed block; a block that raises only counts as an error."""
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.errors[phase] = self.errors.get(phase, 0) + 1
+            raise
+        self.observe(phase, time.monotonic() - started)
+
+    def record_session(self, success):
+        self.sessions["success" if success else "failure"] += 1
+
+    def to_json(self):
+        return {
+            "sessions": dict(self.sessions),
+            "phases": {
+                phase: {
+                    "count": histogram.count,
+                    "sum_seconds": round(histogram.total, 6),
+                    "mean_seconds": round(histogram.total / histogram.count, 6) if histogram.count else None,
+                    "errors": self.errors.get(phase, 0),
+                    "buckets": {("+Inf" if bound == float("inf") else str(bound)): count
+                                for bound, count in histogram.cumulative()},
+                }
+                for phase, histogram in self.phases.items()
+            },
+        }
+
+    def to_prometheus(self):
+        name = f"{METRIC_PREFIX}_phase_seconds"
+        lines = [f"# HELP {name} Time spent in each provisioning phase.", f"# TYPE {name} histogram"]
+        for phase, histogram in self.phases.items():
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else str(bound)
+                lines.append(f'{name}_bucket{{phase="{phase}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{phase="{phase}"}} {histogram.total}')
+            lines.append(f'{name}_count{{phase="{phase}"}} {histogram.count}')
+
+        lines += [f"# HELP {METRIC_PREFIX}_phase_errors_total Phases that ended with an error.",
+                  f"# TYPE {METRIC_PREFIX}_phase_errors_total counter"]
+        lines += [f'{METRIC_PREFIX}_phase_errors_total{{phase="{phase}"}} {count}'
+                  for phase, count in self.errors.items()]
+        lines += [f"# HELP {METRIC_PREFIX}_sessions_total Provisioning sessions by outcome.",
+                  f"# TYPE {METRIC_PREFIX}_sessions_total counter"]
+        lines += [f'{METRIC_PREFIX}_sessions_total{{outcome="{outcome}"}} {count}'
+                  for outcome, count in self.sessions.items()]
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port, host="0.0.0.0"):
+        """Serves /metrics (Prometheus text) and /metrics.json until cancelled."""
+        async def handle(reader, writer):
+            try:
+                request_line = await reader.readline()
+                while (await reader.readline()).strip():
+                    pass  # Headers are not needed
+                path = request_line.split()[1].decode() if len(request_line.split()) > 1 else "/"
+                if path == "/metrics.json":
+                    status, content_type, body = "200 OK", "application/json", json.dumps(self.to_json())
+                elif path == "/metrics":
+                    status, content_type, body = "200 OK", "text/plain; version=0.0.4", self.to_prometheus()
+                else:
+                    status, content_type, body = "404 Not Found", "text/plain", "Not found\n"
+                payload = body.encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+                await writer.drain()
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        log.info("Serving provisioning metrics on port %d", port)
+        async with server:
+            await server.serve_forever()
+
+    async def dump_periodically(self, path, interval):
+        """Rewrites a JSON snapshot of the metrics every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = json.dumps(self.to_json(), indent=2)
+            await asyncio.to_thread(_write_file, path, snapshot)
+
+def _write_file(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+metrics = ProvisioningMetrics()
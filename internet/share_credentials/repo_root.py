@@ -0,0 +1 @@
+../../repo_root.py
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""NetworkManager over one persistent D-Bus connection.
+
+Shared by the kiosk, the credentials portal and the Pico provisioning script so that reading
+credentials, device IPs and scan results, or bringing up a connection, does not fork nmcli,
+iwlist or sudo every time.
+
+Needs dbus-python (the python3-dbus package on Raspberry Pi OS). shared_client() returns None
+when it or the system bus is unavailable, and callers then use their subprocess paths.
+fake_network_manager.FakeSystemBus stands in for the bus in benchmarks and experiments.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+NM_SERVICE = "org.freedesktop.NetworkManager"
+NM_PATH = "/org/freedesktop/NetworkManager"
+NM_SETTINGS_PATH = "/org/freedesktop/NetworkManager/Settings"
+NM_IFACE = "org.freedesktop.NetworkManager"
+SETTINGS_IFACE = "org.freedesktop.NetworkManager.Settings"
+CONNECTION_IFACE = "org.freedesktop.NetworkManager.Settings.Connection"
+ACTIVE_IFACE = "org.freedesktop.NetworkManager.Connection.Active"
+DEVICE_IFACE = "org.freedesktop.NetworkManager.Device"
+WIRELESS_IFACE = "org.freedesktop.NetworkManager.Device.Wireless"
+AP_IFACE = "org.freedesktop.NetworkManager.AccessPoint"
+IP4_IFACE = "org.freedesktop.NetworkManager.IP4Config"
+PROPERTIES_IFACE = "org.freedesktop.DBus.Properties"
+
+WIFI_TYPE = "802-11-wireless"
+WIFI_SECURITY = "802-11-wireless-security"
+
+# Access point flag bits (NM80211ApFlags / NM80211ApSecurityFlags)
+AP_FLAG_PRIVACY = 0x1
+AP_SEC_KEY_MGMT_SAE = 0x400
+
+# Active connection states (NMActiveConnectionState)
+ACTIVATING = 1
+ACTIVATED = 2
+DEACTIVATED = 4
+
+CACHE_TTL = 5  # Seconds results of read-only calls are reused by shared_client()
+SCAN_TIMEOUT = 10  # Seconds to wait for a requested scan to finish
+ACTIVATION_TIMEOUT = 30  # Seconds to wait for a connection to come up, nmcli's default is 90
+POLL_INTERVAL = 0.1
+
+class NetworkManagerError(Exception):
+    """A D-Bus call to NetworkManager failed."""
+
+@dataclass(frozen=True)
+class ActiveConnection:
+    id: str
+    uuid: str
+    type: str
+    devices: tuple  # Interface names, e.g. ("wlan0",)
+    settings_path: str
+
+@dataclass(frozen=True)
+class AccessPoint:
+    ssid: str
+    bssid: str
+    strength: int  # 0-100
+    frequency: int  # MHz
+    encryption: str  # "open", "WEP", "WPA", "WPA2" or "WPA3"
+
+    @property
+    def signal(self):
+        """Approximate signal level in dBm, on the same scale as iwlist's quality conversion."""
+        return self.strength // 2 - 100
+
+    @property
+    def channel(self):
+        if 2412 <= self.frequency <= 2472:
+            return (self.frequency - 2407) // 5
+        if self.frequency == 2484:
+            return 14
+        if 5000 <= self.frequency <= 5900:
+            return (self.frequency - 5000) // 5
+        return None
+
+def _text(value):
+    """A D-Bus byte array (SSIDs) or string as str."""
+    if isinstance(value, str):
+        return str(value)
+    return bytes(int(b) for b in value).decode("utf-8", errors="replace")
+
+def _encryption(flags, wpa_flags, rsn_flags):
+    if rsn_flags & AP_SEC_KEY_MGMT_SAE:
+        return "WPA3"
+    if rsn_flags:
+        return "WPA2"
+    if wpa_flags:
+        return "WPA"
+    return "WEP" if flags & AP_FLAG_PRIVACY else "open"
+
+class NetworkManagerClient:
+    """Typed NetworkManager calls over a dbus-python style bus.
+
+    Read-only results are cached for cache_ttl seconds (0 disables caching); activate()
+    clears the cache. Safe to share between threads.
+    """
+
+    def __init__(self, bus, cache_ttl=0):
+        self.bus = bus
+        self.cache_ttl = cache_ttl
+        self._cache = {}  # key -> (monotonic time, value)
+        self._lock = threading.Lock()
+
+    def _get(self, path, interface, name):
+        try:
+            return self.bus.get_object(NM_SERVICE, path).Get(interface, name, dbus_interface=PROPERTIES_IFACE)
+        except Exception as e:
+            raise NetworkManagerError(f"{interface}.{name} on {path}: {e}") from e
+
+    def _get_all(self, path, interface):
+        try:
+            return self.bus.get_object(NM_SERVICE, path).GetAll(interface, dbus_interface=PROPERTIES_IFACE)
+        except Exception as e:
+            raise NetworkManagerError(f"{interface} properties on {path}: {e}") from e
+
+    def _call(self, path, interface, method, *args):
+        try:
+            return self.bus.get_object(NM_SERVICE, path).get_dbus_method(method, interface)(*args)
+        except Exception as e:
+            raise NetworkManagerError(f"{interface}.{method} on {path}: {e}") from e
+
+    def _cached(self, key, compute):
+        if self.cache_ttl:
+            with self._lock:
+                entry = self._cache.get(key)
+            if entry and time.monotonic() - entry[0] < self.cache_ttl:
+                return entry[1]
+        value = compute()
+        if self.cache_ttl:
+            with self._lock:
+                self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def active_connections(self):
+        def compute():
+            connections = []
+            for path in self._get(NM_PATH, NM_IFACE, "ActiveConnections"):
+                props = self._get_all(path, ACTIVE_IFACE)
+                devices = tuple(str(self._get(device, DEVICE_IFACE, "Interface")) for device in props["Devices"])
+                connections.append(ActiveConnection(
+                    str(props["Id"]), str(props["Uuid"]), str(props["Type"]), devices, str(props["Connection"])
+                ))
+            return connections
+        return self._cached("active_connections", compute)
+
+    def is_active(self, connection_id):
+        return any(connection.id == connection_id for connection in self.active_connections())
+
+    def connection_paths(self):
+        """Connection id -> settings object path for every saved connection profile."""
+        def compute():
+            paths = {}
+            for path in self._call(NM_SETTINGS_PATH, SETTINGS_IFACE, "ListConnections"):
+                settings = self._call(path, CONNECTION_IFACE, "GetSettings")
+                paths[str(settings["connection"]["id"])] = str(path)
+            return paths
+        return self._cached("connection_paths", compute)
+
+    def secrets(self, settings_path, setting=WIFI_SECURITY):
+        """Secrets of one setting of a connection, e.g. {"psk": "..."}; needs the right polkit rights."""
+        def compute():
+            secrets = self._call(settings_path, CONNECTION_IFACE, "GetSecrets", setting)
+            return {str(key): str(value) for key, value in secrets.get(setting, {}).items()}
+        return self._cached(("secrets", settings_path, setting), compute)
+
+    def _wireless_settings(self, connection):
+        settings = self._cached(
+            ("settings", connection.settings_path),
+            lambda: self._call(connection.settings_path, CONNECTION_IFACE, "GetSettings"),
+        )
+        return settings.get(WIFI_TYPE, {})
+
+    def _is_hotspot(self, connection):
+        return str(self._wireless_settings(connection).get("mode", "infrastructure")) == "ap"
+
+    def wifi_credentials(self):
+        """(ssid, psk) of the active Wi-Fi client connection, or (None, None)."""
+        for connection in self.active_connections():
+            if connection.type != WIFI_TYPE or self._is_hotspot(connection):
+                continue
+            ssid = _text(self._wireless_settings(connection).get("ssid", b""))
+            return ssid, self.secrets(connection.settings_path).get("psk")
+        return None, None
+
+    def hotspot_active(self, interface):
+        """True while the device runs an access point, when NetworkManager refuses to scan on it."""
+        return any(
+            connection.type == WIFI_TYPE and interface in connection.devices and self._is_hotspot(connection)
+            for connection in self.active_connections()
+        )
+
+    def device_path(self, interface):
+        return self._cached(
+            ("device", interface),
+            lambda: str(self._call(NM_PATH, NM_IFACE, "GetDeviceByIpIface", interface)),
+        )
+
+    def device_ip(self, interface):
+        """First IPv4 address of the device, without the prefix length, or None."""
+        def compute():
+            config = self._get(self.device_path(interface), DEVICE_IFACE, "Ip4Config")
+            if str(config) == "/":
+                return None
+            addresses = self._get(config, IP4_IFACE, "AddressData")
+            return str(addresses[0]["address"]) if addresses else None
+        return self._cached(("device_ip", interface), compute)
+
+    def activate(self, connection_id, interface=None, timeout=ACTIVATION_TIMEOUT):
+        """Brings up a saved connection, like `nmcli connection up <id>`.
+
+        ActivateConnection returns as soon as activation starts; this waits until the connection
+        is activated, so the device already has its address when it returns.
+        """
+        paths = self.connection_paths()
+        if connection_id not in paths:
+            raise NetworkManagerError(f"No connection named {connection_id!r}")
+        device = self.device_path(interface) if interface else "/"
+        active = self._call(NM_PATH, NM_IFACE, "ActivateConnection", paths[connection_id], device, "/")
+        self.invalidate()
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self._get(active, ACTIVE_IFACE, "State")
+            if state == ACTIVATED:
+                break
+            if state == DEACTIVATED:
+                raise NetworkManagerError(f"Connection {connection_id!r} failed to activate")
+            if time.monotonic() >= deadline:
+                raise NetworkManagerError(f"Connection {connection_id!r} not activated within {timeout}s")
+            time.sleep(POLL_INTERVAL)
+        self.invalidate()
+
+    def access_points(self, interface, rescan=True, timeout=SCAN_TIMEOUT):
+        """Access points seen by a Wi-Fi device; with rescan, requests a fresh scan first.
+
+        NetworkManager refuses to scan while the device runs a hotspot; that raises
+        NetworkManagerError like any other failure.
+        """
+        device = self.device_path(interface)
+        if rescan:
+            self._request_scan(device, interface, timeout)
+            return self._read_access_points(device)
+        return self._cached(("access_points", interface), lambda: self._read_access_points(device))
+
+    def _request_scan(self, device, interface, timeout):
+        before = self._get(device, WIRELESS_IFACE, "LastScan")
+        self._call(device, WIRELESS_IFACE, "RequestScan", {})
+        deadline = time.monotonic() + timeout
+        while self._get(device, WIRELESS_IFACE, "LastScan") == before:
+            if time.monotonic() >= deadline:
+                raise NetworkManagerError(f"Scan on {interface} did not finish within {timeout}s")
+            time.sleep(POLL_INTERVAL)
+
+    def _read_access_points(self, device):
+        access_points = []
+        for path in self._call(device, WIRELESS_IFACE, "GetAllAccessPoints"):
+            props = self._get_all(path, AP_IFACE)
+            access_points.append(AccessPoint(
+                _text(props["Ssid"]),
+                str(props["HwAddress"]),
+                int(props["Strength"]),
+                int(props["Frequency"]),
+                _encryption(int(props["Flags"]), int(props["WpaFlags"]), int(props["RsnFlags"])),
+            ))
+        return access_points
+
+_shared_client = None
+
+def shared_client(cache_ttl=CACHE_TTL):
+    """The process-wide client, or None when dbus-python or the system bus is unavailable."""
+    global _shared_client
+    if _shared_client is None:
+        try:
+            import dbus
+
+            _shared_client = NetworkManagerClient(dbus.SystemBus(), cache_ttl)
+        except Exception as e:
+            log.warning("NetworkManager D-Bus client unavailable (%s), using command-line tools", e)
+            _shared_client = False
+    return _shared_client or None
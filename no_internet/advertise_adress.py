@@ -1,34 +1,68 @@
-import tkinter as tk
-from PIL import Image, ImageTk, ImageSequence
+import sys
 import threading
 import subprocess
+import socket
+import queue
 import time
-import qrcode
 
-import subprocess
-import time
+from network_state import NetworkManagerState
+
+import repo_root  # noqa: F401 - puts the repository root, home of the modules below, on sys.path
+from network_manager import NetworkManagerError, shared_client
+from startup_profile import profile_and_exit, report_ready
+
+HOTSPOT_CONNECTION = "Hotspot"
+HOTSPOT_DEVICE = "wlan0"
+HOTSPOT_WAIT_TIMEOUT = 60  # Seconds to wait for the Hotspot profile before trying to start it anyway
+
+PORTAL_HOST = "0.0.0.0"
+PORTAL_PORT = 8080
+PORTAL_IN_PROCESS = True  # Serve the Flask app from a thread of this process instead of a second python3
+PORTAL_READY_TIMEOUT = 30  # Seconds to wait for the portal to accept connections
+UI_POLL_INTERVAL = 50  # Milliseconds between drains of the UI update queue
+
+_network_state = None
+_qr_photos = {}  # url -> PhotoImage, so redraws reuse the image
+
+def network_state():
+    """Shared NetworkManager state, started on first use."""
+    global _network_state
+    if _network_state is None:
+        _network_state = NetworkManagerState().start()
+    return _network_state
 
-def wait_for_hotspot():
-    """Wait indefinitely until 'Hotspot' appears in the list of available connections."""
+def wait_for_hotspot(timeout=None):
+    """Wait until 'Hotspot' appears in the list of available connections.
+
+    Returns False if the timeout expires or the wait is cancelled with network_state().stop().
+    """
     print("Waiting for 'Hotspot' to appear in available connections...")
-    while True:
-        result = subprocess.run(
-            ["nmcli", "-t", "-f", "NAME", "connection", "show"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        connections = result.stdout.splitlines()
-        if "Hotspot" in connections:
-            print("'Hotspot' is now available.")
-            return True
+    if network_state().wait_for_connection(HOTSPOT_CONNECTION, timeout):
+        print("'Hotspot' is now available.")
+        return True
+    print("Gave up waiting for 'Hotspot'.")
+    return False
 
 def start_hotspot():
     """Start the Wi-Fi hotspot."""
+    if network_state().is_active(HOTSPOT_CONNECTION):
+        print("Hotspot is already active.")
+        return True
+
+    nm = shared_client()
+    if nm:
+        try:
+            print("Starting Hotspot over D-Bus...")
+            nm.activate(HOTSPOT_CONNECTION)
+            print("Hotspot started successfully.")
+            return True
+        except NetworkManagerError as e:
+            print(f"D-Bus activation failed ({e}), falling back to nmcli.")
+
     try:
         print("Starting Hotspot...")
         result = subprocess.run(
-            ["sudo", "nmcli", "connection", "up", "Hotspot"],
+            ["sudo", "nmcli", "connection", "up", HOTSPOT_CONNECTION],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
@@ -50,34 +84,92 @@ def start_flask_server():
     except Exception as e:
         print(f"Error starting Flask server: {e}")
 
+def wait_for_port(port, timeout):
+    """Wait until something accepts connections on the local port."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+class PortalServer:
+    """The credentials portal served from a managed thread of this process."""
+
+    def __init__(self, host=PORTAL_HOST, port=PORTAL_PORT):
+        self.host = host
+        self.port = port
+        self.ready = threading.Event()  # Set once the socket listens, or when startup failed
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        try:
+            from start_flask_server_for_credentials import create_server, scanner
+
+            scanner.start()  # Have networks ready before the first phone connects
+            # The server binds and listens before create_server() returns
+            self._server = create_server(self.host, self.port)
+        except Exception as e:
+            print(f"Error starting Flask server: {e}")
+            self.ready.set()
+            return
+        self.ready.set()
+        self._server.serve_forever()
+
+    def wait_ready(self, timeout=None):
+        """True once the portal accepts connections."""
+        return self.ready.wait(timeout) and self._server is not None
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+def start_portal():
+    """Start the credentials portal and return a function that waits until it serves requests."""
+    if PORTAL_IN_PROCESS:
+        return PortalServer().start().wait_ready
+    threading.Thread(target=start_flask_server, daemon=True).start()
+    return lambda timeout: wait_for_port(PORTAL_PORT, timeout)
+
 def get_ip_address():
-    """Get the local IP address of wlan0 using nmcli without the subnet mask."""
+    """Get the local IP address of wlan0 without the subnet mask."""
+    nm = shared_client()
+    if nm:
+        try:
+            address = nm.device_ip(HOTSPOT_DEVICE)
+            if address:
+                return address
+        except NetworkManagerError as e:
+            print(f"D-Bus lookup of the IP address failed: {e}")
     try:
-        result = subprocess.run(
-            ["nmcli", "device", "show", "wlan0"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        output = result.stdout
-        for line in output.split("\n"):
-            if "IP4.ADDRESS" in line:
-                ip_with_subnet = line.split(":")[1].strip()
-                return ip_with_subnet.split("/")[0]
-        return "IP address not found"
+        return network_state().get_ip_address(HOTSPOT_DEVICE) or "IP address not found"
     except Exception as e:
         return f"Error: {str(e)}"
 
 def generate_qr_code(url):
-    """Generate a QR code image from the provided URL and return a Tkinter PhotoImage."""
-    qr = qrcode.QRCode(version=1, box_size=5, border=2)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    return ImageTk.PhotoImage(img)
+    """Return a Tkinter PhotoImage of the QR code for the URL, built once per URL."""
+    if url not in _qr_photos:
+        from PIL import ImageTk
+        from display_assets import qr_image
+
+        _qr_photos[url] = ImageTk.PhotoImage(qr_image(url))
+    return _qr_photos[url]
 
 def display_message():
     """Create a fullscreen tkinter window displaying instructions, a loading animation, and a QR code."""
+    started = time.monotonic()
+    # GUI libraries are only loaded once the window is actually built
+    import tkinter as tk
+    from display_assets import load_animation
+
     root = tk.Tk()
     root.title("Remote Access Info")
     root.attributes("-fullscreen", True)
@@ -95,46 +187,49 @@ def display_message():
     instruction_label = tk.Label(content_frame, text="", font=("Arial", 18), fg="white", bg="black")
     instruction_label.pack(side=tk.TOP, anchor="center")
 
-    # Load the loading GIF frames
-    gif_frames = []
+    # Load the loading GIF frames, decoded once and cached on disk
+    gif_frames = None
     try:
-        gif = Image.open("loading.gif")  # Replace with your GIF file path
-        for frame in ImageSequence.Iterator(gif):
-            frame_image = ImageTk.PhotoImage(frame.copy().convert("RGBA"))
-            gif_frames.append(frame_image)
+        display_size = (root.winfo_screenwidth(), root.winfo_screenheight())
+        gif_frames = load_animation("loading.gif", display_size)  # Replace with your GIF file path
     except Exception as e:
         print("Error loading GIF:", e)
 
     def play_gif():
-        """Animate the loading GIF."""
-        if gif_frames:
-            frame = gif_frames[play_gif.current_frame]
-            play_gif.current_frame = (play_gif.current_frame + 1) % len(gif_frames)
-            loading_label.configure(image=frame)
-        root.after(100, play_gif)
+        """Show the next GIF frame for as long as the GIF says it lasts."""
+        index = play_gif.current_frame
+        loading_label.configure(image=gif_frames.photo(index))
+        play_gif.current_frame = (index + 1) % len(gif_frames)
+        play_gif.after_id = root.after(gif_frames.durations[index], play_gif)
     play_gif.current_frame = 0
+    play_gif.after_id = None
 
-    def update_display_with_ip():
-        """Start services, get the IP address, update instructions, and display a QR code."""
-        print("Starting Hotspot...")
-        wait_for_hotspot()
-        hotspot_started = start_hotspot()
-
-        print("Starting Flask server...")
-        threading.Thread(target=start_flask_server, daemon=True).start()
+    def stop_gif():
+        if play_gif.after_id:
+            root.after_cancel(play_gif.after_id)
+            play_gif.after_id = None
 
-        time.sleep(5)  # Allow time for initialization
+    # Tk is not thread-safe: background threads queue callables that run on the Tk thread
+    ui_updates = queue.Queue()
 
-        ip_address = get_ip_address()
-        port = 8080
-        url = f"http://{ip_address}:{port}"
+    def drain_ui_updates():
+        while True:
+            try:
+                update = ui_updates.get_nowait()
+            except queue.Empty:
+                break
+            update()
+        root.after(UI_POLL_INTERVAL, drain_ui_updates)
 
+    def show_portal(url):
+        """Replace the loading animation with the instructions and a QR code for the portal."""
         message = (
             "Vă rugăm să vă conectați la hotspot-ul \"Input Wifi Here\".\n"
             f"Apoi deschideți browser-ul și navigați la:\n\n{url}\n\n"
             " sau scanați codul QR pentru a introduce acreditările Wi-Fi.\n"
         )
         # Remove the loading animation and update the instructions
+        stop_gif()
         loading_label.pack_forget()
         instruction_label.config(text=message)
 
@@ -143,11 +238,43 @@ def display_message():
         qr_label = tk.Label(content_frame, image=qr_img, bg="black")
         qr_label.image = qr_img  # Prevent garbage collection
         qr_label.pack(side=tk.TOP, anchor="center")
-    
-    play_gif()
+        print(f"QR code shown {time.monotonic() - started:.2f}s after start.")
+
+    def show_portal_error():
+        stop_gif()
+        loading_label.pack_forget()
+        instruction_label.config(text="Portalul de configurare nu a pornit. Reporniți dispozitivul.")
+
+    def update_display_with_ip():
+        """Start services and the portal, then queue the instructions and QR code for the Tk thread."""
+        print("Starting Hotspot...")
+        wait_for_hotspot(HOTSPOT_WAIT_TIMEOUT)
+        start_hotspot()
+
+        print("Starting Flask server...")
+        portal_ready = start_portal()
+        if not portal_ready(PORTAL_READY_TIMEOUT):
+            print(f"Flask server did not accept connections within {PORTAL_READY_TIMEOUT}s.")
+            ui_updates.put(show_portal_error)
+            return
+        print(f"Flask server ready {time.monotonic() - started:.2f}s after start.")
+
+        url = f"http://{get_ip_address()}:{PORTAL_PORT}"
+        ui_updates.put(lambda: show_portal(url))
+
+    if gif_frames:
+        play_gif()
+    drain_ui_updates()
+    root.after_idle(report_ready)
     threading.Thread(target=update_display_with_ip, daemon=True).start()
 
     root.mainloop()
 
-if __name__ == "__main__":
+def main():
+    if "--profile-startup" in sys.argv[1:]:
+        # Re-run under the profiler, which stops the script once the window is up
+        profile_and_exit(__file__)
     display_message()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Load benchmark for the credentials portal; needs no Wi-Fi hardware.
+
+Starts start_flask_server_for_credentials.py in a temporary directory where `sudo`, `iwlist`
+and `connect_wifi.sh` are local fakes, then has many concurrent clients behave like installers
+on the hotspot: load the page and its assets, revalidate the network list and submit credentials.
+Reports requests per second and latency percentiles per endpoint.
+
+Usage:
+    python3 bench_portal.py --clients 50 --duration 20 --json
+    python3 bench_portal.py --log-requests   # the same load with per-request logging on
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import repo_root  # noqa: F401 - puts the repository root, home of bench_common, on sys.path
+from bench_common import percentile
+
+PORTAL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "start_flask_server_for_credentials.py")
+
+FAKE_SUDO = """#!/bin/sh
+exec "$@"
+"""
+
+FAKE_IWLIST = """#!/bin/sh
+sleep {scan_seconds}
+echo "wlan0     Scan completed :"
+i=1
+while [ $i -le {networks} ]; do
+    printf '          Cell %02d - Address: AA:BB:CC:DD:%02X:%02X\\n' $i $((i / 256)) $((i % 256))
+    echo "                    Channel:$((i % 11 + 1))"
+    echo "                    Quality=40/70  Signal level=-$((30 + i % 60)) dBm"
+    echo "                    Encryption key:on"
+    echo "                    ESSID:\\"Network $i\\""
+    echo "                    IE: IEEE 802.11i/WPA2 Version 1"
+    i=$((i + 1))
+done
+"""
+
+FAKE_CONNECT = """#!/bin/sh
+sleep {connect_seconds}
+echo "Successfully connected to $1."
+"""
+
+def write_fakes(directory, args):
+    fakes = {
+        "sudo": FAKE_SUDO,
+        "iwlist": FAKE_IWLIST.format(scan_seconds=args.scan_ms / 1000, networks=args.networks),
+        "connect_wifi.sh": FAKE_CONNECT.format(connect_seconds=args.connect_ms / 1000),
+    }
+    for name, content in fakes.items():
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o755)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_portal(directory, port, log_requests):
+    """Runs the portal against the fakes and returns once it accepts connections."""
+    env = dict(os.environ, PATH=f"{directory}:{os.environ.get('PATH', '')}")
+    command = [sys.executable, PORTAL_SCRIPT, "--host", "127.0.0.1", "--port", str(port)]
+    if log_requests:
+        command.append("--log-requests")
+    process = subprocess.Popen(command, cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("The portal did not start")
+
+class Installer:
+    """One simulated phone: a keep-alive connection and the caches a browser would keep."""
+
+    def __init__(self, port, results, submit_ratio):
+        self.port = port
+        self.results = results  # endpoint -> list of latencies; "errors" -> count
+        self.submit_ratio = submit_ratio
+        self.connection = None
+        self.etags = {}
+        self.assets_loaded = False
+
+    def request(self, endpoint, method, path, body=None, headers=None):
+        headers = dict(headers or {}, **{"Accept-Encoding": "gzip"})
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            if response.getheader("Connection", "").lower() == "close":
+                self.connection.close()
+                self.connection = None
+        except (OSError, http.client.HTTPException):
+            if self.connection:
+                self.connection.close()
+            self.connection = None
+            self.results["errors"] += 1
+            return None
+        self.results.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if response.status >= 500:
+            self.results["errors"] += 1
+        return response
+
+    def visit(self):
+        """One round of what a browser does on the portal."""
+        self.request("page", "GET", "/")
+        if not self.assets_loaded:
+            # Assets are immutable; a browser fetches them once
+            for asset in ("portal.css", "portal.js"):
+                self.request("asset", "GET", f"/assets/{asset}")
+            self.assets_loaded = True
+
+        etag = self.etags.get("networks")
+        response = self.request("networks", "GET", "/api/networks", headers={"If-None-Match": etag} if etag else None)
+        if response is not None and response.getheader("ETag"):
+            self.etags["networks"] = response.getheader("ETag")
+
+        if random.random() < self.submit_ratio:
+            body = json.dumps({"ssid": f"Network {random.randint(1, 5)}", "password": "bench-password"})
+            response = self.request("submit", "POST", "/api/jobs", body, {"Content-Type": "application/json"})
+            if response is not None and response.getheader("Location"):
+                self.request("job", "GET", response.getheader("Location"))
+
+def run_clients(port, args):
+    results = {"errors": 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.duration
+
+    def client():
+        local = {"errors": 0}
+        installer = Installer(port, local, args.submit_ratio)
+        while time.monotonic() < stop_at:
+            installer.visit()
+        with lock:
+            results["errors"] += local.pop("errors")
+            for endpoint, latencies in local.items():
+                results.setdefault(endpoint, []).extend(latencies)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - started
+
+def summarize(latencies):
+    return {
+        "requests": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+def run_benchmark(args):
+    with tempfile.TemporaryDirectory(prefix="licn-portal-bench-") as directory:
+        write_fakes(directory, args)
+        port = free_port()
+        portal = start_portal(directory, port, args.log_requests)
+        try:
+            results, elapsed = run_clients(port, args)
+        finally:
+            portal.terminate()
+            portal.wait()
+
+    errors = results.pop("errors")
+    everything = [latency for latencies in results.values() for latency in latencies]
+    return {
+        # The portal runs on this interpreter and uses waitress whenever it is installed
+        "server": "waitress" if importlib.util.find_spec("waitress") else "werkzeug",
+        "request_logging": args.log_requests,
+        "clients": args.clients,
+        "duration_seconds": round(elapsed, 2),
+        "requests": len(everything),
+        "errors": errors,
+        "requests_per_second": round(len(everything) / elapsed, 1),
+        "overall": summarize(everything) if everything else None,
+        "endpoints": {endpoint: summarize(latencies) for endpoint, latencies in sorted(results.items())},
+    }
+
+def print_report(result):
+    print(f"{result['server']}, request logging {'on' if result['request_logging'] else 'off'}, {result['clients']} clients for {result['duration_seconds']}s: "
+          f"{result['requests']} requests, {result['requests_per_second']} req/s, {result['errors']} errors")
+    rows = [("overall", result["overall"])] + list(result["endpoints"].items())
+    for endpoint, stats in rows:
+        if stats:
+            print(f"  {endpoint:<9} {stats['requests']:>7} req  p50 {stats['p50_ms']:>7} ms  "
+                  f"p95 {stats['p95_ms']:>7} ms  p99 {stats['p99_ms']:>7} ms  max {stats['max_ms']:>7} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the credentials portal against fake Wi-Fi tools.")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent simulated phones")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--networks", type=int, default=30, help="networks the fake iwlist reports")
+    parser.add_argument("--scan-ms", type=float, default=2000, help="how long a fake scan takes")
+    parser.add_argument("--connect-ms", type=float, default=1000, help="how long the fake connect script takes")
+    parser.add_argument("--submit-ratio", type=float, default=0.05, help="share of visits that submit credentials")
+    parser.add_argument("--log-requests", action="store_true", help="run the portal with per-request logging")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for reproducible runs")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    result = run_benchmark(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+if __name__ == "__main__":
+    main()
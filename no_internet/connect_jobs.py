@@ -0,0 +1,103 @@
+import collections
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+
+MAX_FINISHED_JOBS = 50  # Finished jobs kept around for polling
+
+QUEUED = "queued"
+CONNECTING = "connecting"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+@dataclass
+class ConnectJob:
+    """One credential submission and what became of it."""
+    id: str
+    ssid: str
+    password: str = field(repr=False)
+    state: str = QUEUED
+    message: str = ""  # Output of the connect script, stderr when it failed
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    @property
+    def finished(self):
+        return self.state in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        """Public view of the job; never includes the password."""
+        return {
+            "id": self.id,
+            "ssid": self.ssid,
+            "state": self.state,
+            "message": self.message,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+class ConnectJobQueue:
+    """Runs connect attempts one at a time on a background thread.
+
+    connect(ssid, password) is the blocking call returning (success, message). Submitting an SSID
+    that already has a job waiting or running returns that job instead of queueing another
+    attempt, so the radio is not reconfigured twice; a waiting job takes the newest password.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self._jobs = {}  # id -> job, in submission order
+        self._pending = collections.deque()
+        self._lock = threading.Condition()
+        self._thread = None
+
+    def submit(self, ssid, password):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.ssid != ssid or job.finished:
+                    continue
+                if job.state == QUEUED:
+                    job.password = password
+                    return job
+                if job.password == password:
+                    return job  # Already connecting with these credentials
+
+            job = ConnectJob(secrets.token_hex(8), ssid, password)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._prune()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._lock.notify()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._pending)
+                job = self._pending.popleft()
+                job.state = CONNECTING
+                ssid, password = job.ssid, job.password
+
+            print(f"Connecting to {ssid}...")
+            try:
+                success, message = self.connect(ssid, password)
+            except Exception as e:
+                success, message = False, str(e)
+
+            with self._lock:
+                job.state = SUCCEEDED if success else FAILED
+                job.message = message
+                job.finished_at = time.time()
+            print(f"Connecting to {ssid} {job.state}.")
@@ -0,0 +1,113 @@
+"""Kiosk images decoded once and cached on disk, so later boots skip the decoding.
+
+Animation frames are stored as raw RGBA, one file per (GIF contents, display size), and read
+back through mmap. QR codes are stored as PNG, one file per URL.
+"""
+import hashlib
+import json
+import mmap
+import os
+
+from PIL import Image, ImageSequence, ImageTk
+
+ASSET_CACHE_DIR = os.environ.get(
+    "LICN_ASSET_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "licn-kiosk")
+)
+DEFAULT_FRAME_DURATION = 100  # Milliseconds, for frames that do not specify one
+MIN_FRAME_DURATION = 20  # Milliseconds; GIFs often store 0 for "as fast as possible"
+QR_BOX_SIZE = 5
+QR_BORDER = 2
+
+def _cache_path(name):
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    return os.path.join(ASSET_CACHE_DIR, name)
+
+def _write_atomically(path, chunks):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(temporary, path)
+
+class AnimationFrames:
+    """Frames of an animation over a raw RGBA buffer; each PhotoImage is created on first use."""
+
+    def __init__(self, size, durations, buffer, offset=0):
+        self.size = size
+        self.durations = durations  # Milliseconds each frame stays on screen
+        self._buffer = buffer
+        self._offset = offset
+        self._photos = {}
+
+    def __len__(self):
+        return len(self.durations)
+
+    def photo(self, index):
+        if index not in self._photos:
+            frame_bytes = self.size[0] * self.size[1] * 4
+            start = self._offset + index * frame_bytes
+            image = Image.frombuffer("RGBA", self.size, self._buffer[start:start + frame_bytes], "raw", "RGBA", 0, 1)
+            self._photos[index] = ImageTk.PhotoImage(image)
+        return self._photos[index]
+
+def _decode_animation(path, display_size):
+    """Decodes every frame to RGBA, shrunk to fit the display, and returns (header, frame bytes)."""
+    frames = []
+    durations = []
+    with Image.open(path) as gif:
+        for frame in ImageSequence.Iterator(gif):
+            durations.append(max(frame.info.get("duration") or DEFAULT_FRAME_DURATION, MIN_FRAME_DURATION))
+            image = frame.convert("RGBA")
+            image.thumbnail(display_size)
+            frames.append(image.tobytes())
+    header = {"size": list(image.size), "durations": durations}
+    return header, frames
+
+def load_animation(path, display_size):
+    """AnimationFrames for the GIF, decoded on the first run and memory-mapped from the cache after."""
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    width, height = display_size
+    cache_file = f"{digest}-{width}x{height}.frames"
+
+    try:
+        cache = open(_cache_path(cache_file), "rb")
+    except OSError:
+        header, frames = _decode_animation(path, display_size)
+        header_line = json.dumps(header).encode() + b"\n"
+        try:
+            _write_atomically(_cache_path(cache_file), [header_line, *frames])
+        except OSError as e:
+            print(f"Could not cache animation frames: {e}")
+        return AnimationFrames(tuple(header["size"]), header["durations"], b"".join(frames))
+
+    with cache:
+        buffer = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+    header_end = buffer.find(b"\n") + 1
+    header = json.loads(buffer[:header_end])
+    return AnimationFrames(tuple(header["size"]), header["durations"], buffer, header_end)
+
+def qr_image(url):
+    """QR code for the URL, generated once and then read back from the cache."""
+    digest = hashlib.sha256(f"{QR_BOX_SIZE}:{QR_BORDER}:{url}".encode()).hexdigest()[:16]
+    path = _cache_path(f"qr-{digest}.png")
+    try:
+        with Image.open(path) as cached:
+            cached.load()
+            return cached
+    except OSError:
+        pass
+
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=QR_BOX_SIZE, border=QR_BORDER)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    try:
+        temporary = f"{path}.{os.getpid()}.tmp"
+        img.save(temporary, format="PNG")
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Could not cache QR code: {e}")
+    return img
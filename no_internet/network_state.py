@@ -0,0 +1,166 @@
+import re
+import subprocess
+import threading
+import time
+
+# Lines printed by `nmcli monitor` that we act on
+CONNECTION_CREATED = re.compile(r"^(?P<name>.+): connection profile created$")
+CONNECTION_REMOVED = re.compile(r"^(?P<name>.+): connection profile removed$")
+DEVICE_USING = re.compile(r"^(?P<device>\S+): using connection '(?P<name>.+)'$")
+DEVICE_STATE = re.compile(r"^(?P<device>\S+): (?P<state>connected|disconnected|unavailable|unmanaged)")
+
+MONITOR_RESTART_DELAY = 2  # Seconds before restarting an nmcli monitor that exited
+POLL_INTERVAL = 5  # Seconds between re-reads when nmcli monitor cannot be started
+
+class NetworkManagerState:
+    """NetworkManager state kept current from a single long-running `nmcli monitor` process.
+
+    Connection names, the connection active on each device and device IPs are read once,
+    then only updated when the monitor reports a change, so callers never fork nmcli in a loop.
+    If the monitor cannot be started, the state is re-read every POLL_INTERVAL seconds instead.
+    """
+
+    def __init__(self):
+        self.connections = set()
+        self.device_connection = {}  # device -> name of the connection active on it
+        self._device_ips = {}  # device -> IPv4 address, dropped when the device changes state
+        self._changed = threading.Condition()
+        self._stopped = threading.Event()
+        self._loaded = threading.Event()  # Set once the initial state has been read
+        self._process = None
+        self._thread = None
+
+    def start(self):
+        """Starts following `nmcli monitor` in the background and returns once the state is read."""
+        if self._thread:
+            return self
+        self._thread = threading.Thread(target=self._follow_monitor, daemon=True)
+        self._thread.start()
+        self._loaded.wait()
+        return self
+
+    def stop(self):
+        """Stops the monitor and wakes anyone still waiting."""
+        self._stopped.set()
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+        with self._changed:
+            self._changed.notify_all()
+
+    def _reload_connections(self):
+        try:
+            result = subprocess.run(
+                ["nmcli", "-t", "-f", "NAME,DEVICE", "connection", "show"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+        except OSError as e:
+            print(f"Error reading connections: {e}")
+            return
+        connections = set()
+        device_connection = {}
+        for line in result.stdout.splitlines():
+            # Terse output escapes ':' inside names as '\:'
+            name, _, device = line.rpartition(":") if ":" in line else (line, "", "")
+            name = name.replace("\\:", ":")
+            connections.add(name)
+            if device:
+                device_connection[device] = name
+        with self._changed:
+            self.connections = connections
+            self.device_connection = device_connection
+            self._changed.notify_all()
+
+    def _follow_monitor(self):
+        while not self._stopped.is_set():
+            try:
+                self._process = subprocess.Popen(
+                    ["nmcli", "monitor"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    bufsize=1,
+                )
+            except OSError as e:
+                print(f"Error starting nmcli monitor: {e}, polling every {POLL_INTERVAL}s")
+                self._poll()
+                return
+
+            # Read the state only once the monitor runs, so no change falls in between;
+            # after a restart this also catches events missed while it was down
+            self._reload_connections()
+            self._loaded.set()
+            for line in self._process.stdout:
+                self._handle(line.strip())
+            self._process.wait()
+            if not self._stopped.is_set():
+                print(f"nmcli monitor exited, restarting in {MONITOR_RESTART_DELAY}s...")
+                time.sleep(MONITOR_RESTART_DELAY)
+
+    def _poll(self):
+        while True:
+            self._reload_connections()
+            with self._changed:
+                self._device_ips.clear()
+            self._loaded.set()
+            if self._stopped.wait(POLL_INTERVAL):
+                return
+
+    def _handle(self, line):
+        with self._changed:
+            if match := CONNECTION_CREATED.match(line):
+                self.connections.add(match["name"])
+            elif match := CONNECTION_REMOVED.match(line):
+                self.connections.discard(match["name"])
+            elif match := DEVICE_USING.match(line):
+                self.device_connection[match["device"]] = match["name"]
+                self._device_ips.pop(match["device"], None)
+            elif match := DEVICE_STATE.match(line):
+                if match["state"] != "connected":
+                    self.device_connection.pop(match["device"], None)
+                self._device_ips.pop(match["device"], None)
+            else:
+                return
+            self._changed.notify_all()
+
+    def wait_for(self, predicate, timeout=None):
+        """Blocks until predicate() is true; False on timeout or stop()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not predicate():
+                if self._stopped.is_set():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return True
+
+    def wait_for_connection(self, name, timeout=None):
+        """Blocks until a connection profile with this name exists."""
+        return self.wait_for(lambda: name in self.connections, timeout)
+
+    def is_active(self, name):
+        with self._changed:
+            return name in self.device_connection.values()
+
+    def get_ip_address(self, device):
+        """IPv4 address of the device, read from nmcli only after the device changed state."""
+        with self._changed:
+            if device in self._device_ips:
+                return self._device_ips[device]
+
+        result = subprocess.run(
+            ["nmcli", "-g", "IP4.ADDRESS", "device", "show", device],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # Multiple addresses are separated by ' | '; each carries its prefix length
+        address = result.stdout.strip().split(" | ")[0].split("/")[0]
+        if not address:
+            return None
+        with self._changed:
+            self._device_ips[device] = address
+        return address
@@ -1,9 +1,31 @@
-from flask import Flask, render_template_string, request
+from flask import Flask, Response, abort, jsonify, request
 import subprocess
 import os
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import asdict
+
+from connect_jobs import ConnectJobQueue
+from wifi_scanner import WifiNetwork, WifiScanner, iter_cells
+
+import repo_root  # noqa: F401 - puts the repository root, home of the modules below, on sys.path
+from network_manager import NetworkManagerError, shared_client
 
 app = Flask(__name__)
 
+PORTAL_HOST = "0.0.0.0"
+PORTAL_PORT = 8080
+SCAN_DEVICE = "wlan0"
+ASSET_MAX_AGE = 365 * 24 * 3600  # Asset URLs carry a content hash, so browsers may keep them
+PORTAL_THREADS = 16  # waitress worker threads; idle keep-alive connections do not hold one
+# Scan event streams followed at once; each holds a worker thread for up to SCAN_STREAM_TIMEOUT,
+# so this stays below PORTAL_THREADS and page loads always find a free thread
+MAX_EVENT_STREAMS = 8
+
 # HTML Template for Wi-Fi configuration page
 wifi_page = """
 <!DOCTYPE html>
@@ -12,46 +34,8 @@ wifi_page = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Wi-Fi Configuration</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: #f4f4f9;
-        }
-        .container {
-            max-width: 400px;
-            margin: 0 auto;
-            background: #fff;
-            padding: 20px;
-            border-radius: 10px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        }
-        h2 {
-            text-align: center;
-        }
-        label {
-            display: block;
-            margin-bottom: 8px;
-            font-weight: bold;
-        }
-        select, input, button {
-            width: 100%;
-            padding: 10px;
-            margin-bottom: 20px;
-            border: 1px solid #ccc;
-            border-radius: 5px;
-        }
-        button {
-            background: #007BFF;
-            color: #fff;
-            border: none;
-            cursor: pointer;
-        }
-        button:hover {
-            background: #0056b3;
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('portal.css') }}">
+    <script src="{{ asset_url('portal.js') }}" defer></script>
 </head>
 <body>
     <div class="container">
@@ -59,8 +43,8 @@ wifi_page = """
         <form method="POST">
             <label for="ssid">Available Networks:</label>
             <select id="ssid" name="ssid" required>
-                {% for ssid in ssids %}
-                <option value="{{ ssid }}">{{ ssid }}</option>
+                {% for network in networks %}
+                <option value="{{ network.ssid }}" data-signal="{{ network.signal }}">{{ network.ssid }} ({{ network.signal }} dBm, {{ network.encryption }})</option>
                 {% endfor %}
             </select>
             <label for="password">Password:</label>
@@ -72,27 +56,175 @@ wifi_page = """
 </html>
 """
 
+# Served as cacheable, pre-compressed assets rather than inline with every page
+portal_css = """
+body {
+    font-family: Arial, sans-serif;
+    margin: 0;
+    padding: 20px;
+    background-color: #f4f4f9;
+}
+.container {
+    max-width: 400px;
+    margin: 0 auto;
+    background: #fff;
+    padding: 20px;
+    border-radius: 10px;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+}
+h2 {
+    text-align: center;
+}
+label {
+    display: block;
+    margin-bottom: 8px;
+    font-weight: bold;
+}
+select, input, button {
+    width: 100%;
+    padding: 10px;
+    margin-bottom: 20px;
+    border: 1px solid #ccc;
+    border-radius: 5px;
+}
+button {
+    background: #007BFF;
+    color: #fff;
+    border: none;
+    cursor: pointer;
+}
+button:hover {
+    background: #0056b3;
+}
+"""
+
+portal_js = """
+// Networks found by the running scan arrive one by one; keep the list strongest first
+var select = document.getElementById("ssid");
+
+function showNetwork(network) {
+    var options = Array.prototype.slice.call(select.options);
+    var option = options.filter(function (o) { return o.value === network.ssid; })[0];
+    if (option && Number(option.dataset.signal) >= network.signal) {
+        return;
+    }
+    if (!option) {
+        option = document.createElement("option");
+        option.value = network.ssid;
+    }
+    option.textContent = network.ssid + " (" + network.signal + " dBm, " + network.encryption + ")";
+    option.dataset.signal = network.signal;
+    var weaker = options.filter(function (o) { return o !== option && Number(o.dataset.signal) < network.signal; })[0];
+    select.insertBefore(option, weaker || null);
+}
+
+if (window.EventSource) {
+    var source = new EventSource("/api/networks/stream");
+    source.onmessage = function (event) { showNetwork(JSON.parse(event.data)); };
+    // Without this the browser reconnects and streams again
+    source.addEventListener("done", function () { source.close(); });
+}
+"""
+
+# Shown after a submission; polls the job until the connect script has finished
+job_page = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Wi-Fi Configuration</title>
+</head>
+<body>
+    <h2 id="status">Connecting to {{ job.ssid }}...</h2>
+    <script>
+        var heading = document.getElementById("status");
+
+        function poll() {
+            fetch("/api/jobs/{{ job.id }}").then(function (response) {
+                return response.json();
+            }).then(function (job) {
+                if (job.state === "succeeded") {
+                    heading.textContent = "Successfully connected to " + job.ssid + ". Rebooting...";
+                } else if (job.state === "failed") {
+                    heading.textContent = "Failed to connect to " + job.ssid + ": " + job.message;
+                } else {
+                    heading.textContent = (job.state === "queued" ? "Waiting to connect to " : "Connecting to ") + job.ssid + "...";
+                    setTimeout(poll, 1000);
+                }
+            }).catch(function () {
+                // The hotspot may drop while the radio is reconfigured
+                setTimeout(poll, 2000);
+            });
+        }
+        poll();
+    </script>
+</body>
+</html>
+"""
+
+class StaticAsset:
+    """A text asset kept in memory with a gzip copy compressed once at startup."""
+
+    def __init__(self, content, mimetype):
+        self.body = content.encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.mimetype = mimetype
+        self.version = hashlib.sha256(self.body).hexdigest()[:12]
+
+static_assets = {
+    "portal.css": StaticAsset(portal_css, "text/css"),
+    "portal.js": StaticAsset(portal_js, "application/javascript"),
+}
+
+def asset_url(name):
+    return f"/assets/{name}?v={static_assets[name].version}"
+
+# Templates are compiled once here instead of by render_template_string on every request
+app.jinja_env.globals["asset_url"] = asset_url
+wifi_template = app.jinja_env.from_string(wifi_page)
+job_template = app.jinja_env.from_string(job_page)
+
 def scan_wifi():
-    """Scans for available Wi-Fi networks using iwlist and returns a list of SSIDs."""
+    """Scans for available Wi-Fi networks, yielding each one as it is read.
+
+    NetworkManager is asked over D-Bus unless wlan0 runs the hotspot, which it refuses to scan
+    on; that is the usual case while the portal is up, and iwlist is used then. Raises
+    RuntimeError if iwlist fails (e.g. "Device or resource busy"), so the scanner keeps serving
+    the previous list.
+    """
+    nm = shared_client()
+    access_points = None
     try:
-        result = subprocess.run(
-            ["sudo", "iwlist", "wlan0", "scan"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        output = result.stdout
-        ssids = set()
-        for line in output.split("\n"):
-            line = line.strip()
-            if "ESSID:" in line:
-                ssid = line.split("ESSID:")[1].strip().strip('"')
-                if ssid:
-                    ssids.add(ssid)
-        return sorted(ssids)
-    except Exception as e:
-        print(f"Error scanning Wi-Fi: {e}")
-        return []
+        if nm and not nm.hotspot_active(SCAN_DEVICE):
+            access_points = nm.access_points(SCAN_DEVICE)
+    except NetworkManagerError as e:
+        print(f"NetworkManager scan failed ({e}), using iwlist.")
+    if access_points is not None:
+        for ap in access_points:
+            if ap.ssid:
+                yield WifiNetwork(ap.ssid, ap.bssid, ap.signal, ap.channel, ap.encryption)
+        return
+
+    process = subprocess.Popen(
+        ["sudo", "iwlist", SCAN_DEVICE, "scan"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        yield from iter_cells(process.stdout)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.strip() or f"iwlist exited with {process.returncode}")
+
+# Requests only read this cache; the scanner thread is the only caller of scan_wifi()
+scanner = WifiScanner(scan_wifi)
+event_streams = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+request_logging = False  # Set by create_server()
 
 def connect_to_wifi(ssid, password):
     """Connect to a Wi-Fi network using a helper script."""
@@ -110,20 +242,135 @@ def connect_to_wifi(ssid, password):
     except Exception as e:
         return False, str(e)
 
+# Submissions are connected one at a time by a background thread, never inside a request
+jobs = ConnectJobQueue(connect_to_wifi)
+
 @app.route("/", methods=["GET", "POST"])
 def wifi_config():
-    ssids = scan_wifi()
     if request.method == "POST":
-        ssid = request.form["ssid"]
-        password = request.form["password"]
+        job = jobs.submit(request.form["ssid"], request.form["password"])
+        return job_template.render(job=job), 202
 
-        success, message = connect_to_wifi(ssid, password)
-        if success:
-            return f"<h2>Successfully connected to {ssid}. Rebooting...</h2>"
-        else:
-            return f"<h2>Failed to connect to {ssid}: {message}</h2>"
+    # Never wait for a scan here: the page lists what is cached and the stream fills in the rest
+    return wifi_template.render(networks=scanner.networks(wait=0))
+
+@app.route("/assets/<name>")
+def static_asset(name):
+    """CSS and JavaScript, gzip-compressed when the client accepts it and cacheable for a year."""
+    asset = static_assets.get(name)
+    if asset is None:
+        abort(404)
+    compressed = bool(request.accept_encodings["gzip"])
+    response = Response(asset.gzipped if compressed else asset.body, mimetype=asset.mimetype)
+    if compressed:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    response.cache_control.immutable = True
+    response.set_etag(asset.version + ("-gzip" if compressed else ""))
+    return response.make_conditional(request)
+
+@app.route("/api/networks")
+def api_networks():
+    """Scanned networks, strongest first. Clients revalidate with If-None-Match and get a 304
+    while the list is unchanged. Only the cache is read: polling never starts or waits for a
+    scan, which page loads and the event stream trigger."""
+    response = jsonify([asdict(network) for network in scanner.networks(wait=0, refresh=False)])
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route("/api/networks/stream")
+def api_networks_stream():
+    """Server-Sent Events: the cached networks, then each network of the running scan as iwlist
+    reports it, and a final "done" event. Beyond MAX_EVENT_STREAMS open streams, only the cached
+    networks are sent."""
+    def events():
+        following = event_streams.acquire(blocking=False)
+        try:
+            networks = scanner.updates() if following else scanner.networks(wait=0)
+            for network in networks:
+                yield f"data: {json.dumps(asdict(network))}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            if following:
+                event_streams.release()
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route("/api/jobs", methods=["POST"])
+def api_submit_job():
+    """Queues a connect attempt from form or JSON fields and answers with the job at once."""
+    fields = request.get_json(silent=True) or request.form
+    if not fields.get("ssid") or not fields.get("password"):
+        return jsonify({"error": "ssid and password are required"}), 400
+    job = jobs.submit(fields["ssid"], fields["password"])
+    return jsonify(job.to_dict()), 202, {"Location": f"/api/jobs/{job.id}"}
+
+@app.route("/api/jobs/<job_id>")
+def api_job(job_id):
+    """State of a connect job: queued, connecting, succeeded or failed (with the script's stderr)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    response = jsonify(job.to_dict())
+    response.cache_control.no_store = True
+    return response
+
+@app.after_request
+def log_request(response):
+    if request_logging:
+        print(f"{request.remote_addr} {request.method} {request.full_path.rstrip('?')} {response.status_code}")
+    return response
+
+class WaitressServer:
+    """A waitress server behind the serve_forever()/shutdown()/server_port of werkzeug's."""
+
+    def __init__(self, server):
+        self._server = server
+
+    @property
+    def server_port(self):
+        return self._server.effective_port
+
+    def serve_forever(self):
+        self._server.run()
+
+    def shutdown(self):
+        self._server.close()
+
+def create_server(host=PORTAL_HOST, port=PORTAL_PORT, log_requests=False):
+    """The portal's WSGI server, already listening when returned.
+
+    waitress serves it with PORTAL_THREADS worker threads and handles idle connections
+    without one. Without waitress (pip install waitress) the portal falls back to werkzeug's
+    development server, which starts a thread per connection. Per-request logging is off
+    unless log_requests.
+    """
+    global request_logging
+    request_logging = log_requests
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    try:
+        from waitress import create_server as create_waitress_server
+    except ImportError:
+        print("waitress is not installed, serving the portal with werkzeug's development server.")
+        from werkzeug.serving import make_server
+
+        return make_server(host, port, app, threaded=True)
+    return WaitressServer(create_waitress_server(app, host=host, port=port, threads=PORTAL_THREADS))
+
+def main():
+    parser = argparse.ArgumentParser(description="Wi-Fi credentials portal.")
+    parser.add_argument("--host", default=PORTAL_HOST)
+    parser.add_argument("--port", type=int, default=PORTAL_PORT)
+    parser.add_argument("--log-requests", action="store_true", help="log every request")
+    args = parser.parse_args()
 
-    return render_template_string(wifi_page, ssids=ssids)
+    scanner.start()
+    server = create_server(args.host, args.port, args.log_requests)
+    print(f"Serving the portal on http://{args.host}:{server.server_port}")
+    server.serve_forever()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080)
+    main()
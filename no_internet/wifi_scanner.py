@@ -0,0 +1,186 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+SCAN_TTL = 30  # Seconds a scan result is served before a new scan is started
+FIRST_SCAN_WAIT = 10  # Seconds a request may wait when no scan has finished yet
+SCAN_STREAM_TIMEOUT = 30  # Seconds an update stream follows a running scan at most
+
+SIGNAL_LEVEL = re.compile(r"Signal level[=:](-?\d+)(?:/(\d+))?")
+CHANNEL = re.compile(r"Channel[: ](\d+)")
+
+@dataclass
+class WifiNetwork:
+    """One access point from an iwlist scan."""
+    ssid: str
+    bssid: str
+    signal: int  # dBm
+    channel: int = None
+    encryption: str = "open"  # "open", "WEP", "WPA", "WPA2" or "WPA3"
+
+def iter_cells(lines):
+    """Yields a WifiNetwork for each `Cell` block of iwlist output, in a single pass over the lines.
+
+    Hidden networks (empty ESSID) are skipped.
+    """
+    cell = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("Cell "):
+            if cell and cell["ssid"]:
+                yield _network(cell)
+            cell = {"bssid": line.partition("Address: ")[2], "ssid": "", "signal": -100,
+                    "channel": None, "key": False, "ie": set()}
+        elif cell is None:
+            continue
+        elif line.startswith("ESSID:"):
+            cell["ssid"] = line[6:].strip('"').replace("\\x00", "")
+        elif line.startswith("Channel:") or line.startswith("Frequency:"):
+            # Some drivers only print the channel inside the Frequency line
+            if cell["channel"] is None and (match := CHANNEL.search(line)):
+                cell["channel"] = int(match[1])
+        elif line.startswith("Quality") or line.startswith("Signal level"):
+            if match := SIGNAL_LEVEL.search(line):
+                level, scale = match.groups()
+                # Some drivers report a 0-100 quality instead of dBm
+                cell["signal"] = int(level) if scale is None else int(level) // 2 - 100
+        elif line.startswith("Encryption key:"):
+            cell["key"] = line.endswith("on")
+        elif line.startswith("IE: IEEE 802.11i/WPA2"):
+            cell["ie"].add("WPA2")
+        elif line.startswith("IE: WPA Version"):
+            cell["ie"].add("WPA")
+        elif line.startswith("Authentication Suites") and "SAE" in line:
+            cell["ie"].add("WPA3")
+    if cell and cell["ssid"]:
+        yield _network(cell)
+
+def _network(cell):
+    if not cell["key"]:
+        encryption = "open"
+    else:
+        encryption = next((kind for kind in ("WPA3", "WPA2", "WPA") if kind in cell["ie"]), "WEP")
+    return WifiNetwork(cell["ssid"], cell["bssid"], cell["signal"], cell["channel"], encryption)
+
+def strongest_by_ssid(networks):
+    """One entry per SSID, the BSSID with the best signal, strongest first."""
+    best = {}
+    for network in networks:
+        if network.ssid not in best or network.signal > best[network.ssid].signal:
+            best[network.ssid] = network
+    return sorted(best.values(), key=lambda network: -network.signal)
+
+class WifiScanner:
+    """Wi-Fi networks from the last scan, refreshed by one background thread.
+
+    Readers always get the cached list straight away. Once it is older than the TTL they still
+    get it, and a refresh starts in the background (stale-while-revalidate). Refresh requests
+    that arrive while a scan is running share that scan, so the radio scans at most once at a time.
+    Networks of a running scan are published as the scan yields them, see updates().
+    """
+
+    def __init__(self, scan, ttl=SCAN_TTL):
+        self.scan = scan  # Callable returning an iterable of WifiNetwork, raising if the scan fails
+        self.ttl = ttl
+        self._networks = []
+        self._scanned_at = None  # Monotonic time of the last finished scan
+        self._scanning = False  # True from the moment a scan is requested until it finishes
+        self._progress = []  # Networks the current (or last) scan has yielded so far
+        self._refresh = threading.Event()
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """Starts the scanner thread and the first scan."""
+        with self._changed:
+            if self._thread:
+                return self
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self.request_refresh()
+        return self
+
+    @property
+    def age(self):
+        """Seconds since the last finished scan, None before the first one."""
+        return None if self._scanned_at is None else time.monotonic() - self._scanned_at
+
+    def request_refresh(self):
+        """Asks for a scan unless one is running or the cache is still fresh."""
+        with self._changed:
+            if self._scanning or (self.age is not None and self.age < self.ttl):
+                return
+            self._scanning = True
+            self._progress = []
+        self._refresh.set()
+
+    def networks(self, wait=FIRST_SCAN_WAIT, refresh=True):
+        """The cached networks; waits up to `wait` seconds only if no scan has finished yet.
+
+        With refresh, a stale list also starts a background scan; without it the cache is only read.
+        """
+        self.start()
+        if refresh:
+            self.request_refresh()
+        with self._changed:
+            if self._scanned_at is None and wait:
+                self._changed.wait_for(lambda: self._scanned_at is not None, wait)
+            return list(self._networks)
+
+    def updates(self, timeout=SCAN_STREAM_TIMEOUT):
+        """Yields the cached networks, then each new or stronger network of the running scan as it
+        arrives, and returns once that scan has finished (or after `timeout` seconds)."""
+        self.start()
+        self.request_refresh()
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            cached = list(self._networks)
+            progress = self._progress if self._scanning else None
+
+        sent = {}
+        for network in cached:
+            sent[network.ssid] = network.signal
+            yield network
+        if progress is None:
+            return
+
+        index = 0
+        while True:
+            with self._changed:
+                # Our scan is over once it stops running or a newer scan has replaced its list
+                finished = lambda: progress is not self._progress or not self._scanning
+                self._changed.wait_for(
+                    lambda: len(progress) > index or finished(), max(deadline - time.monotonic(), 0)
+                )
+                arrived = progress[index:]
+                done = finished() or time.monotonic() >= deadline
+            index += len(arrived)
+            for network in arrived:
+                if network.ssid not in sent or network.signal > sent[network.ssid]:
+                    sent[network.ssid] = network.signal
+                    yield network
+            if done:
+                return
+
+    def _run(self):
+        while True:
+            self._refresh.wait()
+            self._refresh.clear()
+            with self._changed:
+                progress = self._progress
+            try:
+                for network in self.scan():
+                    with self._changed:
+                        progress.append(network)
+                        self._changed.notify_all()
+                failed = False
+            except Exception as e:
+                print(f"Error scanning Wi-Fi: {e}")
+                failed = True
+            with self._changed:
+                self._scanning = False
+                if not failed:
+                    self._networks = strongest_by_ssid(progress)
+                self._scanned_at = time.monotonic()
+                self._changed.notify_all()
@@ -0,0 +1,12 @@
+"""Puts the repository root on sys.path, where the modules shared by internet/share_credentials
+and no_internet live (network_manager, startup_profile, bench_common).
+
+Those directories link to this file, so their scripts can `import repo_root` before any of the
+shared modules; the link is resolved to find the root.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.realpath(__file__))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
@@ -0,0 +1,151 @@
+"""Startup profiler for the Python entry points.
+
+Runs a script under `python -X importtime` and reports the import time of each top-level
+module, the wall-clock time until the script reports its first useful action, and its peak
+RSS at that point. Every run is appended to a JSON lines history, so startup regressions show
+up over time.
+
+A profiled script runs with LICN_PROFILE_STARTUP set and calls report_ready() once it does
+something useful; the profiler then stops it. The entry points also accept --profile-startup,
+which re-runs them through this script with profile_and_exit().
+
+Usage:
+    python3 startup_profile.py no_internet/advertise_adress.py
+    python3 internet/share_credentials/connect_to_pico.py --profile-startup
+"""
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+PROFILE_ENV = "LICN_PROFILE_STARTUP"
+STARTUP_READY_LINE = "startup: ready"
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_profile.jsonl")
+READY_TIMEOUT = 120  # Seconds before a script that never reports ready is killed
+TOP_IMPORTS = 15  # Modules listed in the text report
+
+# "import time:       412 |       1337 |   encodings.aliases", indented two spaces per level
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+def report_ready():
+    """Tells the profiler that the running entry point is doing something useful; a no-op when
+    it is not being profiled."""
+    if os.environ.get(PROFILE_ENV):
+        print(STARTUP_READY_LINE, file=sys.stderr, flush=True)
+
+def profile_and_exit(script):
+    """Re-runs an entry point under this profiler, for its --profile-startup flag."""
+    sys.exit(subprocess.call([sys.executable, os.path.abspath(__file__), os.path.abspath(script)]))
+
+def parse_import_line(line):
+    """(module, self µs, cumulative µs, nesting depth) for an -X importtime line, else None."""
+    match = IMPORT_LINE.match(line)
+    if not match:
+        return None
+    self_us, cumulative_us, indent, module = match.groups()
+    return module, int(self_us), int(cumulative_us), len(indent) // 2
+
+def peak_rss_kib(pid):
+    """High-water mark of a running process's resident set, in KiB."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def profile(script, args=(), timeout=READY_TIMEOUT):
+    """Runs the script until it reports ready (or exits) and returns the measurements."""
+    script = os.path.abspath(script)
+    env = dict(os.environ, **{PROFILE_ENV: "1"})
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", script, *args],
+        cwd=os.path.dirname(script),
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    watchdog = threading.Timer(timeout, process.kill)
+    watchdog.start()
+
+    imports = []
+    ready_seconds = None
+    peak_rss = None
+    try:
+        for line in process.stderr:
+            line = line.rstrip("\n")
+            parsed = parse_import_line(line)
+            if parsed:
+                imports.append(parsed)
+            elif line == STARTUP_READY_LINE:
+                ready_seconds = time.monotonic() - started
+                peak_rss = peak_rss_kib(process.pid)
+                break
+            elif not line.startswith("import time:"):
+                print(line, file=sys.stderr)
+    finally:
+        watchdog.cancel()
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+
+    if peak_rss is None:
+        # Exited before reporting ready; the children's maximum is the only figure left
+        peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: -entry[2])
+    return {
+        "script": os.path.relpath(script, os.path.dirname(HISTORY_PATH)),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ready_seconds": round(ready_seconds, 3) if ready_seconds is not None else None,
+        "exit_code": process.returncode if ready_seconds is None else None,
+        "peak_rss_kib": peak_rss,
+        "import_total_ms": round(sum(entry[1] for entry in imports) / 1000, 1),
+        "modules_imported": len(imports),
+        "imports": [
+            {"module": module, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for module, self_us, cumulative, _ in top_level
+        ],
+    }
+
+def print_report(result):
+    print(f"Startup profile of {result['script']}")
+    if result["ready_seconds"] is None:
+        print(f"  Never reported ready (exit code {result['exit_code']})")
+    else:
+        print(f"  Time to first useful action: {result['ready_seconds']:.3f}s")
+    print(f"  Peak RSS: {result['peak_rss_kib'] / 1024:.1f} MiB")
+    print(f"  Imports: {result['modules_imported']} modules, {result['import_total_ms']} ms")
+    for entry in result["imports"][:TOP_IMPORTS]:
+        print(f"    {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile the startup of a Python entry point.")
+    parser.add_argument("script", help="entry point to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed to the script")
+    parser.add_argument("--timeout", type=float, default=READY_TIMEOUT, help="seconds to wait for ready")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON lines file each run is appended to")
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = profile(args.script, args.args, args.timeout)
+    if not args.no_history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(result) + "\n")
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+if __name__ == "__main__":
+    main()